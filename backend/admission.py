@@ -0,0 +1,156 @@
+"""Controle de admissão para as queries dinâmicas de /api/query.
+
+Antes de executar, o custo de cada query é estimado pelo planner (EXPLAIN):
+
+- custo <= QUERY_HEAVY_COST: roda direto (pista normal)
+- custo <= QUERY_COST_BUDGET: query pesada, entra na pista de baixa prioridade,
+  limitada por cliente e no total; espera até HEAVY_QUEUE_TIMEOUT_SECONDS por vaga
+- custo > QUERY_COST_BUDGET: rejeitada com sugestão de filtros mais restritos
+
+Toda query roda com statement_timeout próprio. Enquanto espera na fila, a
+query não segura conexão do pool: as consultas normais continuam sendo atendidas.
+
+O cliente dos limites é o endereço de quem conecta. X-Client-Id só vale quando
+vem de um par em TRUSTED_CLIENT_ID_PEERS (gateway que autentica, host do replay);
+de outros, trocar o cabeçalho burlaria o limite por cliente.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+QUERY_COST_BUDGET = float(os.getenv("QUERY_COST_BUDGET", "5000000"))
+QUERY_HEAVY_COST = float(os.getenv("QUERY_HEAVY_COST", "250000"))
+QUERY_STATEMENT_TIMEOUT_MS = int(os.getenv("QUERY_STATEMENT_TIMEOUT_MS", "15000"))
+MAX_HEAVY_QUERIES_PER_CLIENT = int(os.getenv("MAX_HEAVY_QUERIES_PER_CLIENT", "1"))
+MAX_HEAVY_QUERIES_TOTAL = int(os.getenv("MAX_HEAVY_QUERIES_TOTAL", "3"))
+HEAVY_QUEUE_TIMEOUT_SECONDS = float(os.getenv("HEAVY_QUEUE_TIMEOUT_SECONDS", "10"))
+TRUSTED_CLIENT_ID_PEERS = {
+    peer.strip() for peer in os.getenv("TRUSTED_CLIENT_ID_PEERS", "").split(",") if peer.strip()
+}
+
+# Dimensões que multiplicam o número de grupos
+HIGH_CARDINALITY_DIMENSIONS = ["product", "customer_city", "day", "hour", "week"]
+
+# SQLSTATE do Postgres para query cancelada por statement_timeout
+QUERY_CANCELED = "57014"
+
+def resolve_client_id(peer: Optional[str], header_client_id: Optional[str]) -> str:
+    """Cliente dos limites: X-Client-Id de um par confiável ou o endereço do par"""
+    if header_client_id and peer in TRUSTED_CLIENT_ID_PEERS:
+        return header_client_id
+    return peer or "anonymous"
+
+def suggest_narrower_query(dimensions: List[str], filters: Dict, date_range: Dict) -> str:
+    """Monta uma sugestão de como reduzir o custo da consulta"""
+    suggestions = []
+    if not date_range.get("start_date") or not date_range.get("end_date"):
+        suggestions.append("defina um período (data inicial e final)")
+    else:
+        suggestions.append("reduza o período analisado")
+    if not filters.get("store_ids"):
+        suggestions.append("filtre por loja")
+    if not filters.get("channels"):
+        suggestions.append("filtre por canal")
+    heavy_dimensions = [d for d in dimensions if d in HIGH_CARDINALITY_DIMENSIONS]
+    if len(dimensions) > 1 and heavy_dimensions:
+        suggestions.append(f"remova dimensões de alta cardinalidade ({', '.join(heavy_dimensions)})")
+    return "Sugestão: " + "; ".join(suggestions) + "."
+
+def set_statement_timeout(db: Session, timeout_ms: int = QUERY_STATEMENT_TIMEOUT_MS):
+    """Limita o tempo da query na transação atual"""
+    db.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+
+def is_statement_timeout(error: Exception) -> bool:
+    orig = getattr(error, "orig", None)
+    return getattr(orig, "pgcode", None) == QUERY_CANCELED
+
+class AdmissionController:
+    """Limita queries pesadas por cliente e no total"""
+
+    def __init__(
+        self,
+        cost_budget: float = QUERY_COST_BUDGET,
+        heavy_cost: float = QUERY_HEAVY_COST,
+        max_per_client: int = MAX_HEAVY_QUERIES_PER_CLIENT,
+        max_total: int = MAX_HEAVY_QUERIES_TOTAL,
+        queue_timeout: float = HEAVY_QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.cost_budget = cost_budget
+        self.heavy_cost = heavy_cost
+        self.max_per_client = max_per_client
+        self.queue_timeout = queue_timeout
+        self._heavy_slots = threading.BoundedSemaphore(max_total)
+        self._lock = threading.Lock()
+        self._heavy_by_client: Dict[str, int] = {}
+
+    def classify(self, cost: float) -> str:
+        if cost > self.cost_budget:
+            return "rejected"
+        if cost > self.heavy_cost:
+            return "heavy"
+        return "normal"
+
+    @contextmanager
+    def admit(self, client_id: str, cost: float, suggestion: str, before_wait: Optional[Callable[[], None]] = None):
+        """Reserva a execução da query; levanta HTTPException se não for admitida.
+
+        before_wait é chamado antes de bloquear na fila (ex.: devolver a conexão ao pool).
+        """
+        lane = self.classify(cost)
+
+        if lane == "rejected":
+            raise HTTPException(
+                status_code=422,
+                detail=(
+                    f"Consulta muito custosa (custo estimado {cost:,.0f}, limite {self.cost_budget:,.0f}). "
+                    f"{suggestion}"
+                ),
+            )
+
+        if lane == "normal":
+            yield lane
+            return
+
+        with self._lock:
+            running = self._heavy_by_client.get(client_id, 0)
+            if running >= self.max_per_client:
+                raise HTTPException(
+                    status_code=429,
+                    detail=(
+                        "Você já tem uma consulta pesada em execução. "
+                        f"Aguarde ela terminar ou restrinja a consulta. {suggestion}"
+                    ),
+                )
+            self._heavy_by_client[client_id] = running + 1
+
+        try:
+            # Fila da pista de baixa prioridade
+            acquired = self._heavy_slots.acquire(blocking=False)
+            if not acquired:
+                if before_wait:
+                    before_wait()
+                acquired = self._heavy_slots.acquire(timeout=self.queue_timeout)
+            if not acquired:
+                raise HTTPException(
+                    status_code=503,
+                    detail=(
+                        "O servidor está processando muitas consultas pesadas. "
+                        f"Tente novamente em instantes. {suggestion}"
+                    ),
+                )
+            try:
+                yield lane
+            finally:
+                self._heavy_slots.release()
+        finally:
+            with self._lock:
+                remaining = self._heavy_by_client.get(client_id, 1) - 1
+                if remaining > 0:
+                    self._heavy_by_client[client_id] = remaining
+                else:
+                    self._heavy_by_client.pop(client_id, None)
@@ -0,0 +1,88 @@
+"""Redução de séries temporais para gráficos (Largest-Triangle-Three-Buckets).
+
+O LTTB divide a série em max_points - 2 baldes e escolhe, em cada um, o ponto
+que forma o maior triângulo com o ponto já escolhido e a média do balde
+seguinte. Picos e vales sobrevivem, e o tamanho do resultado não depende do
+período consultado. Primeiro e último pontos são sempre mantidos.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, List, Sequence, Tuple
+
+# Dimensões que formam um eixo temporal contínuo (hour e day_of_week são cíclicas)
+TIME_DIMENSIONS = ["day", "week", "month", "quarter"]
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """Índices dos pontos mantidos, em ordem crescente"""
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    selected = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+
+        # Média do balde seguinte (no último balde, o último ponto)
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        next_count = next_end - end
+        avg_x = sum(xs[end:next_end]) / next_count
+        avg_y = sum(ys[end:next_end]) / next_count
+
+        best_index, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best_index, best_area = j, area
+        selected.append(best_index)
+        a = best_index
+
+    selected.append(n - 1)
+    return selected
+
+def to_number(value: Any) -> float:
+    if value is None:
+        return 0.0
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, date):
+        return float(value.toordinal())
+    return float(value)
+
+def downsample_time_series(
+    rows: List[Dict[str, Any]],
+    time_dimension: str,
+    series_dimensions: List[str],
+    metric: str,
+    max_points: int,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Aplica LTTB a cada série (combinação das demais dimensões) usando `metric` como eixo y.
+
+    max_points vale para o resultado todo e é dividido entre as séries. Se não
+    couberem 3 pontos por série, ficam as séries de maior soma de `metric`.
+    As outras métricas seguem os pontos escolhidos, mantendo as linhas intactas.
+    Retorna as linhas e o número de séries descartadas.
+    """
+    series: Dict[tuple, List[Dict[str, Any]]] = {}
+    for row in rows:
+        series.setdefault(tuple(row[dim] for dim in series_dimensions), []).append(row)
+
+    kept = list(series.values())
+    max_series = max(max_points // 3, 1)
+    if len(kept) > max_series:
+        kept.sort(key=lambda points: sum(abs(to_number(p[metric])) for p in points), reverse=True)
+        kept = kept[:max_series]
+
+    result = []
+    for position, points in enumerate(kept):
+        # Sobra da divisão vai para as primeiras séries: o total nunca passa de max_points
+        budget = max_points // len(kept) + (1 if position < max_points % len(kept) else 0)
+        points = sorted((p for p in points if p[time_dimension] is not None), key=lambda p: p[time_dimension])
+        indices = lttb_indices(
+            [to_number(p[time_dimension]) for p in points],
+            [to_number(p[metric]) for p in points],
+            budget,
+        )
+        result.extend(points[i] for i in indices)
+    return result, len(series) - len(kept)
@@ -0,0 +1,500 @@
+"""Sugere índices a partir da carga real: captura (WORKLOAD_CAPTURE_PATH) ou pg_stat_statements.
+
+1. Reconstrói o SQL de cada requisição capturada com os mesmos builders da API
+   (build_safe_query e build_quick_insights_queries) e agrupa por template, com
+   peso igual ao número de execuções. Com --pg-stat-statements, usa as queries
+   com mais tempo acumulado (os PREPARE da API viram o SELECT interno),
+   planejadas com EXPLAIN (GENERIC_PLAN), que exige Postgres 16+.
+2. Extrai de cada template as colunas filtradas por igualdade e por intervalo,
+   as de join e as agregadas, e gera candidatos: B-tree composto (igualdade
+   antes do intervalo), versão covering (INCLUDE das colunas lidas) e BRIN nas
+   colunas de tempo.
+3. Compara o custo do planner de cada template com e sem os candidatos, usando
+   índices hipotéticos (hypopg). Sem hypopg, --real-indexes cria os índices de
+   verdade dentro de uma transação desfeita com ROLLBACK (bloqueia escritas na
+   tabela durante a criação; use fora do horário de pico).
+4. Escolhe até --max-indexes índices pelo benefício ponderado (custo evitado x
+   execuções) e gera uma migração com CREATE INDEX CONCURRENTLY IF NOT EXISTS.
+
+Também aponta entradas de database/indexes.sql cujas tabelas ou colunas não
+existem no schema conectado (ex.: delivery_location e location no init_simple.sql).
+
+Uso:
+    python index_advisor.py --capture captures/workload.jsonl
+    python index_advisor.py --pg-stat-statements --output ../database/migrations/advisor.sql
+"""
+import argparse
+import os
+import re
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from main import QueryRequest, build_quick_insights_queries, build_safe_query, choose_data_source, engine
+from replay_workload import load_capture
+from rollups import load_ready_rollups
+
+DEFAULT_INDEXES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database", "indexes.sql")
+
+# Aliases usados pelos builders de main.py
+TABLE_ALIASES = {
+    "o": "orders",
+    "oi": "order_items",
+    "p": "products",
+    "s": "stores",
+    "c": "customers",
+    "r": "daily_product_sales",
+    "k": "daily_delivery_sketches",
+}
+
+# Colunas de tempo, inseridas em ordem: candidatas a BRIN
+TIME_COLUMNS = {"order_date", "created_at", "sale_date"}
+
+# Abaixo desta fração do custo total da carga o índice não compensa a escrita extra
+MIN_BENEFIT_RATIO = 0.01
+
+COLUMN = r"\b(\w+)\.(\w+)\b"
+EQUALITY = re.compile(COLUMN + r"\s*=\s*(?:ANY\s*\(|:\w|\$\d|')")
+RANGE = re.compile(COLUMN + r"\s*(?:>=|<=|<|>)\s*(?!\w+\.\w)")
+JOIN = re.compile(r"\bON\s+" + COLUMN + r"\s*=\s*" + COLUMN)
+AGGREGATE = re.compile(r"\b(?:SUM|AVG|MIN|MAX|COUNT)\s*\(\s*(?:DISTINCT\s+)?" + COLUMN)
+GROUP_BY = re.compile(r"\bGROUP BY\b(.*?)(?:\bORDER BY\b|\bLIMIT\b|\bHAVING\b|$)", re.S | re.I)
+# Prepared statements da API aparecem no pg_stat_statements como "PREPARE q_... AS SELECT ..."
+PREPARE_PREFIX = re.compile(r"^\s*PREPARE\s+\w+\s*(?:\([^)]*\))?\s+AS\s+", re.I)
+
+# EXPLAIN (GENERIC_PLAN) planeja queries com $1, $2... sem valores
+GENERIC_PLAN_MIN_VERSION = 160000
+
+INDEX_DEFINITION = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF NOT EXISTS\s+)?(\w+)\s+ON\s+(\w+)"
+    r"(?:\s+USING\s+(\w+))?\s*\(([^)]*)\)",
+    re.I,
+)
+
+class WorkloadQuery:
+    """Template SQL da carga, com parâmetros de exemplo e peso"""
+
+    def __init__(self, sql: str, params: Dict[str, Any], label: str, generic: bool = False):
+        self.sql = sql
+        self.params = params
+        self.label = label
+        self.generic = generic
+        self.weight = 0.0
+
+    def explain_sql(self) -> str:
+        options = "FORMAT JSON, GENERIC_PLAN" if self.generic else "FORMAT JSON"
+        return f"EXPLAIN ({options}) {self.sql}"
+
+class Candidate:
+    def __init__(self, table: str, columns: Iterable[str], include: Iterable[str] = (), method: str = "btree"):
+        self.table = table
+        self.columns = tuple(columns)
+        self.include = tuple(c for c in dict.fromkeys(include) if c not in self.columns)
+        self.method = method
+        self.benefit = 0.0
+        self.size_bytes: Optional[int] = None
+        self.helped: Dict[str, float] = {}
+
+    @property
+    def key(self) -> Tuple:
+        return (self.table, self.method, self.columns, self.include)
+
+    @property
+    def name(self) -> str:
+        suffix = {"btree": "", "brin": "_brin"}[self.method] + ("_cov" if self.include else "")
+        return f"idx_{self.table}_{'_'.join(self.columns)}{suffix}"[:63]
+
+    def definition(self, concurrently: bool = False) -> str:
+        using = "" if self.method == "btree" else f" USING {self.method}"
+        include = f" INCLUDE ({', '.join(self.include)})" if self.include else ""
+        prefix = "CREATE INDEX CONCURRENTLY IF NOT EXISTS" if concurrently else "CREATE INDEX"
+        return f"{prefix} {self.name} ON {self.table}{using} ({', '.join(self.columns)}){include}"
+
+def add_query(workload: Dict[str, WorkloadQuery], sql: str, params: Dict[str, Any], label: str, weight: float):
+    query = workload.setdefault(sql, WorkloadQuery(sql, params, label))
+    query.weight += weight
+
+def load_capture_workload(path: str) -> Dict[str, WorkloadQuery]:
+    """Templates das requisições capturadas, reconstruídos com os builders da API"""
+    workload: Dict[str, WorkloadQuery] = {}
+    skipped = 0
+    for record in load_capture(path):
+        if (record.get("status") or 0) >= 400:
+            continue
+        try:
+            if record["path"] == "/api/query":
+                request = QueryRequest(**record["body"])
+                data_source = choose_data_source(request)
+                sql, params = build_safe_query(request, data_source)
+                add_query(workload, sql, params, f"query:{data_source}", 1)
+            elif record["path"] == "/api/quick-insights":
+                args = parse_qs(record.get("query") or "")
+                store_id = int(args["store_id"][0]) if "store_id" in args else None
+                days = int(args.get("days", ["30"])[0])
+                queries, params = build_quick_insights_queries(store_id, days)
+                for name, sql in queries.items():
+                    add_query(workload, sql, params, f"quick-insights:{name}", 1)
+        except (HTTPException, KeyError, TypeError, ValueError):
+            skipped += 1
+    if skipped:
+        print(f"{skipped} requisições da captura ignoradas (corpo inválido)")
+    return workload
+
+def load_pg_stat_statements_workload(conn: Connection, top: int) -> Dict[str, WorkloadQuery]:
+    """Queries analíticas com mais tempo acumulado no pg_stat_statements"""
+    rows = conn.execute(text("""
+        SELECT query, calls
+        FROM pg_stat_statements
+        WHERE query ~* '\\mFROM\\s+(orders|order_items|daily_product_sales|daily_delivery_sketches)\\M'
+        AND query !~* '^\\s*(EXPLAIN|INSERT|UPDATE|DELETE|CREATE|WITH\\s+\\w+\\s+AS\\s*\\(\\s*DELETE)'
+        ORDER BY total_exec_time DESC
+        LIMIT :top
+    """), {"top": top}).fetchall()
+    workload: Dict[str, WorkloadQuery] = {}
+    for query_text, calls in rows:
+        sql = PREPARE_PREFIX.sub("", query_text)
+        label = "pg_stat_statements:prepared" if sql != query_text else "pg_stat_statements"
+        query = workload.setdefault(sql, WorkloadQuery(sql, {}, label, generic=True))
+        query.weight += float(calls)
+    return workload
+
+def table_columns(conn: Connection) -> Dict[str, set]:
+    """Colunas de tabelas e views materializadas do schema public"""
+    rows = conn.execute(text("""
+        SELECT c.relname, a.attname
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND a.attnum > 0 AND NOT a.attisdropped
+        AND c.relkind IN ('r', 'm', 'p')
+    """)).fetchall()
+    columns: Dict[str, set] = {}
+    for table, column in rows:
+        columns.setdefault(table, set()).add(column)
+    return columns
+
+def existing_indexes(conn: Connection) -> List[Tuple[str, str, Tuple[str, ...]]]:
+    rows = conn.execute(text("""
+        SELECT t.relname, am.amname,
+               ARRAY(SELECT pg_get_indexdef(ix.indexrelid, k, true) FROM generate_series(1, ix.indnkeyatts) k)
+        FROM pg_index ix
+        JOIN pg_class t ON t.oid = ix.indrelid
+        JOIN pg_class i ON i.oid = ix.indexrelid
+        JOIN pg_am am ON am.oid = i.relam
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        WHERE n.nspname = 'public'
+    """)).fetchall()
+    return [(table, method, tuple(columns)) for table, method, columns in rows]
+
+def columns_by_table(matches) -> Dict[str, List[str]]:
+    result: Dict[str, List[str]] = {}
+    for alias, column in matches:
+        table = TABLE_ALIASES.get(alias)
+        if table and column not in result.setdefault(table, []):
+            result[table].append(column)
+    return result
+
+def generate_candidates(workload: Dict[str, WorkloadQuery], schema: Dict[str, set]) -> List[Candidate]:
+    """Candidatos derivados dos predicados, joins e agregações de cada template"""
+    candidates: Dict[Tuple, Candidate] = {}
+
+    def add(candidate: Candidate):
+        columns = set(candidate.columns) | set(candidate.include)
+        if candidate.columns and columns <= schema.get(candidate.table, set()):
+            candidates.setdefault(candidate.key, candidate)
+
+    for query in workload.values():
+        equality = columns_by_table(EQUALITY.findall(query.sql))
+        ranges = columns_by_table(RANGE.findall(query.sql))
+        read = columns_by_table(AGGREGATE.findall(query.sql))
+        for group_clause in GROUP_BY.findall(query.sql):
+            for table, columns in columns_by_table(re.findall(COLUMN, group_clause)).items():
+                read.setdefault(table, []).extend(c for c in columns if c not in read[table])
+        joins: Dict[str, List[str]] = {}
+        for left_alias, left_column, right_alias, right_column in JOIN.findall(query.sql):
+            for table, columns in columns_by_table([(left_alias, left_column), (right_alias, right_column)]).items():
+                joins.setdefault(table, []).extend(columns)
+
+        for table in set(equality) | set(ranges) | set(joins):
+            eq_columns = [c for c in equality.get(table, []) if c not in ranges.get(table, [])]
+            range_columns = ranges.get(table, [])[:1]
+            join_columns = [c for c in joins.get(table, []) if table != "orders" or c != "id"]
+            read_columns = read.get(table, []) + join_columns
+
+            if eq_columns or range_columns:
+                keys = eq_columns + range_columns
+                add(Candidate(table, keys))
+                add(Candidate(table, keys, include=read_columns))
+                # Igualdade sozinha ajuda quando o intervalo é pouco seletivo
+                if eq_columns and range_columns:
+                    add(Candidate(table, eq_columns, include=range_columns + read_columns))
+            for column in range_columns:
+                if column in TIME_COLUMNS:
+                    add(Candidate(table, [column], method="brin"))
+            for column in join_columns:
+                add(Candidate(table, [column]))
+                add(Candidate(table, [column], include=read_columns))
+
+    return list(candidates.values())
+
+def drop_existing(candidates: List[Candidate], indexes: List[Tuple[str, str, Tuple[str, ...]]]) -> List[Candidate]:
+    """Remove candidatos sem INCLUDE já cobertos pelo prefixo de um índice existente"""
+    remaining = []
+    for candidate in candidates:
+        covered = any(
+            table == candidate.table
+            and method == candidate.method
+            and columns[:len(candidate.columns)] == candidate.columns
+            for table, method, columns in indexes
+        )
+        if covered and not candidate.include:
+            continue
+        remaining.append(candidate)
+    return remaining
+
+class Evaluator:
+    """Custo do planner para a carga sob um conjunto de índices (hipotéticos ou reais)"""
+
+    def __init__(self, conn: Connection, use_hypopg: bool):
+        self.conn = conn
+        self.use_hypopg = use_hypopg
+        # Último erro de planejamento por template
+        self.errors: Dict[str, str] = {}
+
+    def cost(self, query: WorkloadQuery) -> Optional[float]:
+        savepoint = self.conn.begin_nested()
+        try:
+            plan = self.conn.execute(text(query.explain_sql()), query.params).scalar()
+            savepoint.commit()
+            return float(plan[0]["Plan"]["Total Cost"])
+        except Exception as e:
+            savepoint.rollback()
+            self.errors[query.sql] = str(getattr(e, "orig", e)).strip().splitlines()[0]
+            return None
+
+    def workload_costs(self, workload: List[WorkloadQuery]) -> Dict[str, float]:
+        costs = {}
+        for query in workload:
+            cost = self.cost(query)
+            if cost is not None:
+                costs[query.sql] = cost
+        return costs
+
+    @contextmanager
+    def indexes(self, candidates: List[Candidate]):
+        """Cria os índices só para o planejamento; retorna False em quem não pôde ser criado"""
+        savepoint = self.conn.begin_nested()
+        created = []
+        try:
+            for candidate in candidates:
+                try:
+                    with self.conn.begin_nested():
+                        if self.use_hypopg:
+                            index_oid = self.conn.execute(
+                                text("SELECT indexrelid FROM hypopg_create_index(:ddl)"),
+                                {"ddl": candidate.definition()},
+                            ).scalar()
+                            candidate.size_bytes = self.conn.execute(
+                                text("SELECT hypopg_relation_size(:oid)"), {"oid": index_oid}
+                            ).scalar()
+                        else:
+                            self.conn.execute(text(candidate.definition()))
+                            candidate.size_bytes = self.conn.execute(
+                                text("SELECT pg_relation_size(CAST(:name AS regclass))"), {"name": candidate.name}
+                            ).scalar()
+                    created.append(candidate)
+                except Exception as e:
+                    print(f"Candidato ignorado ({candidate.definition()}): {e}")
+            yield created
+        finally:
+            if self.use_hypopg:
+                self.conn.execute(text("SELECT hypopg_reset()"))
+            savepoint.rollback()
+
+def weighted_cost(workload: Dict[str, WorkloadQuery], costs: Dict[str, float]) -> float:
+    return sum(workload[sql].weight * cost for sql, cost in costs.items())
+
+def choose_indexes(
+    evaluator: Evaluator,
+    workload: Dict[str, WorkloadQuery],
+    candidates: List[Candidate],
+    max_indexes: int,
+    baseline: Dict[str, float],
+) -> Tuple[List[Candidate], Dict[str, float]]:
+    """Seleção gulosa: a cada rodada entra o candidato com maior benefício adicional"""
+    queries = [workload[sql] for sql in baseline]
+    total = weighted_cost(workload, baseline)
+    current = dict(baseline)
+    chosen: List[Candidate] = []
+    remaining = list(candidates)
+
+    while remaining and len(chosen) < max_indexes:
+        best, best_benefit, best_costs = None, 0.0, None
+        for candidate in remaining:
+            with evaluator.indexes(chosen + [candidate]) as created:
+                if candidate not in created:
+                    continue
+                costs = evaluator.workload_costs(queries)
+            # Template que falhou com o índice conta com o custo atual, sem benefício falso
+            costs = {sql: costs.get(sql, cost) for sql, cost in current.items()}
+            benefit = weighted_cost(workload, current) - weighted_cost(workload, costs)
+            if benefit > best_benefit:
+                best, best_benefit, best_costs = candidate, benefit, costs
+        if best is None or best_benefit < total * MIN_BENEFIT_RATIO:
+            break
+        best.benefit = best_benefit
+        best.helped = {
+            workload[sql].label: workload[sql].weight
+            for sql, cost in best_costs.items()
+            if cost < current[sql] * 0.99
+        }
+        chosen.append(best)
+        remaining.remove(best)
+        current = best_costs
+
+    return chosen, current
+
+def broken_static_indexes(path: str, schema: Dict[str, set]) -> List[Tuple[str, str]]:
+    """Entradas do indexes.sql que referenciam tabelas ou colunas inexistentes"""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    broken = []
+    for name, table, _, columns in INDEX_DEFINITION.findall(content):
+        if table not in schema:
+            broken.append((name, f"tabela {table} não existe"))
+            continue
+        for column in (c.strip().split()[0] for c in columns.split(",") if c.strip()):
+            if re.fullmatch(r"\w+", column) and column not in schema[table]:
+                broken.append((name, f"coluna {table}.{column} não existe"))
+    return broken
+
+def format_bytes(size: Optional[int]) -> str:
+    if size is None:
+        return "?"
+    for unit in ("B", "kB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+def render_migration(
+    source: str,
+    mode: str,
+    chosen: List[Candidate],
+    baseline_total: float,
+    final_total: float,
+    broken: List[Tuple[str, str]],
+    unplanned: List[Tuple[WorkloadQuery, str]],
+) -> str:
+    lines = [
+        f"-- Gerado por index_advisor.py em {datetime.now():%Y-%m-%d %H:%M}",
+        f"-- Carga: {source}; avaliação: {mode}",
+        "-- Benefício = redução do custo estimado pelo planner x execuções de cada template",
+        f"-- Custo ponderado da carga: {baseline_total:,.0f} -> {final_total:,.0f}",
+        "-- CREATE INDEX CONCURRENTLY não roda em transação: aplique com psql sem --single-transaction",
+        "",
+    ]
+    if not chosen:
+        lines.append("-- Nenhum índice com benefício relevante para esta carga")
+    for position, candidate in enumerate(chosen, 1):
+        share = candidate.benefit / baseline_total * 100 if baseline_total else 0
+        helped = ", ".join(f"{label} x{weight:.0f}" for label, weight in sorted(candidate.helped.items()))
+        lines.append(
+            f"-- {position}. benefício {candidate.benefit:,.0f} ({share:.1f}% da carga), "
+            f"tamanho estimado {format_bytes(candidate.size_bytes)}; ajuda: {helped or '-'}"
+        )
+        lines.append(candidate.definition(concurrently=True) + ";")
+        lines.append("")
+    if unplanned:
+        lines.append("-- Templates que não puderam ser planejados (fora da avaliação):")
+        for query, error in unplanned:
+            lines.append(f"--   {query.label} x{query.weight:.0f}: {error}")
+            lines.append(f"--     {' '.join(query.sql.split())[:200]}")
+        lines.append("")
+    if broken:
+        lines.append("-- Entradas de database/indexes.sql inválidas neste schema (não são criadas aqui):")
+        lines += [f"--   {name}: {reason}" for name, reason in broken]
+    return "\n".join(lines) + "\n"
+
+def main():
+    parser = argparse.ArgumentParser(description="Sugere índices a partir da carga capturada ou do pg_stat_statements")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--capture", help="Arquivo JSONL gerado com WORKLOAD_CAPTURE_PATH")
+    source.add_argument("--pg-stat-statements", action="store_true", help="Usa as queries mais custosas do pg_stat_statements")
+    parser.add_argument("--top", type=int, default=50, help="Queries lidas do pg_stat_statements")
+    parser.add_argument("--max-indexes", type=int, default=5, help="Máximo de índices sugeridos")
+    parser.add_argument("--real-indexes", action="store_true", help="Sem hypopg: cria índices reais em transação desfeita")
+    parser.add_argument("--indexes-file", default=DEFAULT_INDEXES_FILE, help="indexes.sql a validar contra o schema")
+    parser.add_argument("--output", help="Arquivo da migração (padrão: imprime na tela)")
+    args = parser.parse_args()
+
+    # Mesma escolha de origem (rollup ou pedidos) que a API faz hoje
+    load_ready_rollups(engine)
+
+    with engine.connect() as conn:
+        # Tudo roda numa transação desfeita no final: nada criado para a avaliação sobra
+        transaction = conn.begin()
+        try:
+            use_hypopg = conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'hypopg'")).scalar() is not None
+            if not use_hypopg and not args.real_indexes:
+                parser.error("hypopg não está instalado (CREATE EXTENSION hypopg) - ou use --real-indexes")
+
+            if args.capture:
+                workload = load_capture_workload(args.capture)
+                source_description = f"captura {os.path.basename(args.capture)}"
+            else:
+                version = conn.execute(text("SELECT current_setting('server_version_num')::int")).scalar()
+                if version < GENERIC_PLAN_MIN_VERSION:
+                    parser.error(
+                        f"--pg-stat-statements usa EXPLAIN (GENERIC_PLAN), que exige Postgres 16+ "
+                        f"(servidor: {version // 10000}); use --capture"
+                    )
+                workload = load_pg_stat_statements_workload(conn, args.top)
+                source_description = "pg_stat_statements"
+            if not workload:
+                parser.error("nenhuma query analítica encontrada na carga")
+
+            schema = table_columns(conn)
+            candidates = drop_existing(generate_candidates(workload, schema), existing_indexes(conn))
+            print(f"{len(workload)} templates, {len(candidates)} candidatos")
+
+            evaluator = Evaluator(conn, use_hypopg)
+            baseline = evaluator.workload_costs(list(workload.values()))
+            unplanned = [(query, evaluator.errors[sql]) for sql, query in workload.items() if sql not in baseline]
+            for query, error in unplanned:
+                print(f"Template não planejado ({query.label}): {error}")
+            if not baseline:
+                parser.error("nenhum template da carga pôde ser planejado (erros acima)")
+
+            chosen, final = choose_indexes(evaluator, workload, candidates, args.max_indexes, baseline)
+            migration = render_migration(
+                f"{source_description} ({sum(q.weight for q in workload.values()):.0f} execuções, {len(baseline)} templates)",
+                "hypopg" if use_hypopg else "índices reais + ROLLBACK",
+                chosen,
+                weighted_cost(workload, baseline),
+                weighted_cost(workload, final),
+                broken_static_indexes(args.indexes_file, schema),
+                unplanned,
+            )
+        finally:
+            transaction.rollback()
+
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(migration)
+        print(f"Migração gravada em {args.output}")
+    else:
+        print(migration)
+
+if __name__ == "__main__":
+    main()
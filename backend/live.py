@@ -0,0 +1,325 @@
+"""Dashboard ao vivo: agregados incrementais enviados por Server-Sent Events.
+
+Cada combinação (loja, janela em dias) assinada vira uma LiveWindow, carregada
+uma única vez com uma query agrupada por dia e canal. Depois disso, um único
+poller lê apenas os pedidos novos, aplica-os às janelas e envia aos assinantes
+somente as métricas que mudaram. O custo por atualização depende do número de
+pedidos novos, não do tamanho da janela nem do número de espectadores.
+
+Ids de sequência podem ser confirmados fora de ordem: um pedido com id menor
+pode aparecer depois de outros maiores. Por isso o poller relê os últimos
+LIVE_ID_OVERLAP ids a cada ciclo e ignora os já aplicados. O hub deve ler
+sempre da mesma fonte (o primário); réplicas com atrasos diferentes
+quebrariam essa contabilidade.
+
+Métricas não aditivas (clientes únicos) ficam fora do canal ao vivo.
+"""
+import asyncio
+import json
+import os
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+LIVE_POLL_INTERVAL_SECONDS = float(os.getenv("LIVE_POLL_INTERVAL_SECONDS", "5"))
+LIVE_HEARTBEAT_SECONDS = 15
+# Lote máximo por ciclo do poller; o restante fica para o ciclo seguinte
+LIVE_POLL_BATCH = 5000
+# Ids abaixo do maior visto que ainda são relidos (commits fora de ordem); menor que o lote
+LIVE_ID_OVERLAP = int(os.getenv("LIVE_ID_OVERLAP", "1000"))
+
+WindowKey = Tuple[Optional[int], int]
+
+def empty_totals() -> Dict[str, float]:
+    return {
+        "orders": 0,
+        "revenue": 0.0,
+        "delivery_time_sum": 0.0,
+        "delivery_time_count": 0,
+        "rating_sum": 0.0,
+        "rating_count": 0,
+    }
+
+def add_totals(target: Dict[str, float], source: Dict[str, float], sign: int = 1):
+    for key, value in source.items():
+        target[key] += sign * value
+
+class LiveWindow:
+    """Agregados de uma loja (ou todas) nos últimos `days` dias"""
+
+    def __init__(self, store_id: Optional[int], days: int):
+        self.store_id = store_id
+        self.days = days
+        self.start_date = date.today() - timedelta(days=days)
+        # (dia, canal) -> totais; permite descartar dias que saem da janela
+        self.buckets: Dict[Tuple[date, str], Dict[str, float]] = {}
+        self.totals = empty_totals()
+        self.channel_totals: Dict[str, Dict[str, float]] = {}
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.last_snapshot: Dict[str, Any] = {}
+
+    def load(self, db: Session, floor_order_id: int, applied_ids: List[int]):
+        """Carrega os pedidos já contabilizados pelo hub: ids até floor_order_id e os aplicados acima dele"""
+        store_filter = "AND o.store_id = :store_id" if self.store_id else ""
+        result = db.execute(text(f"""
+            SELECT
+                DATE(o.order_date),
+                o.channel,
+                COUNT(*),
+                COALESCE(SUM(o.total_amount), 0),
+                COALESCE(SUM(o.delivery_time_minutes), 0),
+                COUNT(o.delivery_time_minutes),
+                COALESCE(SUM(o.rating), 0),
+                COUNT(o.rating)
+            FROM orders o
+            WHERE o.order_date >= :start_date
+            AND (o.id <= :floor_order_id OR o.id = ANY(:applied_ids))
+            {store_filter}
+            GROUP BY 1, 2
+        """), {
+            "start_date": self.start_date,
+            "floor_order_id": floor_order_id,
+            "applied_ids": applied_ids,
+            "store_id": self.store_id,
+        })
+        for row in result:
+            bucket = {
+                "orders": row[2],
+                "revenue": float(row[3]),
+                "delivery_time_sum": float(row[4]),
+                "delivery_time_count": row[5],
+                "rating_sum": float(row[6]),
+                "rating_count": row[7],
+            }
+            self._add_bucket(row[0], row[1], bucket)
+        self.last_snapshot = self.snapshot()
+
+    def _add_bucket(self, day: date, channel: str, bucket: Dict[str, float]):
+        add_totals(self.buckets.setdefault((day, channel), empty_totals()), bucket)
+        add_totals(self.totals, bucket)
+        add_totals(self.channel_totals.setdefault(channel, empty_totals()), bucket)
+
+    def apply_order(self, order: Dict[str, Any]) -> bool:
+        """Soma um pedido novo; retorna False se ele não pertence à janela"""
+        if self.store_id and order["store_id"] != self.store_id:
+            return False
+        day = order["order_date"].date()
+        if day < self.start_date:
+            return False
+        bucket = empty_totals()
+        bucket["orders"] = 1
+        bucket["revenue"] = float(order["total_amount"] or 0)
+        if order["delivery_time_minutes"] is not None:
+            bucket["delivery_time_sum"] = float(order["delivery_time_minutes"])
+            bucket["delivery_time_count"] = 1
+        if order["rating"] is not None:
+            bucket["rating_sum"] = float(order["rating"])
+            bucket["rating_count"] = 1
+        self._add_bucket(day, order["channel"], bucket)
+        return True
+
+    def slide(self) -> bool:
+        """Descarta os dias que saíram da janela na virada do dia"""
+        start_date = date.today() - timedelta(days=self.days)
+        if start_date == self.start_date:
+            return False
+        self.start_date = start_date
+        for key in [k for k in self.buckets if k[0] < start_date]:
+            bucket = self.buckets.pop(key)
+            add_totals(self.totals, bucket, sign=-1)
+            add_totals(self.channel_totals[key[1]], bucket, sign=-1)
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        def averages(totals: Dict[str, float]) -> Dict[str, Any]:
+            return {
+                "orders": int(totals["orders"]),
+                "revenue": round(totals["revenue"], 2),
+                "avg_ticket": round(totals["revenue"] / totals["orders"], 2) if totals["orders"] else 0,
+                "avg_delivery_time": round(totals["delivery_time_sum"] / totals["delivery_time_count"], 1)
+                if totals["delivery_time_count"] else 0,
+                "avg_rating": round(totals["rating_sum"] / totals["rating_count"], 2)
+                if totals["rating_count"] else 0,
+            }
+
+        main = averages(self.totals)
+        return {
+            "main_metrics": {
+                "total_orders": main["orders"],
+                "total_revenue": main["revenue"],
+                "avg_ticket": main["avg_ticket"],
+                "avg_delivery_time": main["avg_delivery_time"],
+                "avg_rating": main["avg_rating"],
+            },
+            "channel_performance": {
+                channel: {
+                    "channel": channel,
+                    "orders": values["orders"],
+                    "revenue": values["revenue"],
+                    "avg_delivery_time": values["avg_delivery_time"],
+                }
+                for channel, values in ((c, averages(t)) for c, t in self.channel_totals.items())
+                if values["orders"] > 0
+            },
+        }
+
+    def delta(self) -> Optional[Dict[str, Any]]:
+        """Somente as métricas e canais que mudaram desde o último envio"""
+        current = self.snapshot()
+        previous = self.last_snapshot
+        main_changes = {
+            key: value for key, value in current["main_metrics"].items()
+            if previous.get("main_metrics", {}).get(key) != value
+        }
+        previous_channels = previous.get("channel_performance", {})
+        channel_changes = [
+            values for channel, values in current["channel_performance"].items()
+            if previous_channels.get(channel) != values
+        ]
+        removed_channels = [c for c in previous_channels if c not in current["channel_performance"]]
+        self.last_snapshot = current
+        if not main_changes and not channel_changes and not removed_channels:
+            return None
+        payload: Dict[str, Any] = {"main_metrics": main_changes, "channel_performance": channel_changes}
+        if removed_channels:
+            payload["removed_channels"] = removed_channels
+        return payload
+
+    def publish(self, event: str, payload: Dict[str, Any]):
+        message = f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+        for queue in self.subscribers:
+            queue.put_nowait(message)
+
+class LiveHub:
+    """Poller único que alimenta todas as janelas assinadas"""
+
+    def __init__(self, session_factory: Callable[[], Session], poll_interval: float = LIVE_POLL_INTERVAL_SECONDS):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.windows: Dict[WindowKey, LiveWindow] = {}
+        self.last_order_id: Optional[int] = None
+        # Ids já aplicados dentro da faixa relida (acima de floor_order_id)
+        self.applied_ids: Set[int] = set()
+        self.lock = asyncio.Lock()
+        self.task: Optional[asyncio.Task] = None
+
+    def _run_in_session(self, fn: Callable[[Session], Any]):
+        db = self.session_factory()
+        try:
+            return fn(db)
+        finally:
+            db.close()
+
+    @property
+    def floor_order_id(self) -> int:
+        return self.last_order_id - LIVE_ID_OVERLAP
+
+    def _init_frontier(self, db: Session) -> Tuple[int, Set[int]]:
+        """Maior id visível e os ids da faixa relida que já existem"""
+        max_order_id = db.execute(text("SELECT COALESCE(MAX(id), 0) FROM orders")).scalar()
+        result = db.execute(
+            text("SELECT id FROM orders WHERE id > :floor_order_id"),
+            {"floor_order_id": max_order_id - LIVE_ID_OVERLAP},
+        )
+        return max_order_id, {row[0] for row in result}
+
+    def _fetch_new_orders(self, db: Session, floor_order_id: int):
+        result = db.execute(text("""
+            SELECT id, store_id, order_date, channel, total_amount, delivery_time_minutes, rating
+            FROM orders
+            WHERE id > :floor_order_id
+            ORDER BY id
+            LIMIT :batch
+        """), {"floor_order_id": floor_order_id, "batch": LIVE_POLL_BATCH})
+        return [dict(row._mapping) for row in result]
+
+    async def subscribe(self, store_id: Optional[int], days: int) -> Tuple[LiveWindow, asyncio.Queue]:
+        async with self.lock:
+            # Sem janelas o poller para: pedidos que chegaram nesse intervalo ficariam
+            # fora da carga da nova janela. Recomeça a partir do estado atual
+            if not self.windows:
+                self.last_order_id = None
+            if self.last_order_id is None:
+                self.last_order_id, self.applied_ids = await asyncio.to_thread(
+                    self._run_in_session, self._init_frontier
+                )
+            key = (store_id, days)
+            window = self.windows.get(key)
+            if window is None:
+                window = LiveWindow(store_id, days)
+                # Sob o lock o poller não avança: a janela começa com exatamente os pedidos já aplicados
+                floor_order_id, applied_ids = self.floor_order_id, sorted(self.applied_ids)
+                await asyncio.to_thread(
+                    self._run_in_session, lambda db: window.load(db, floor_order_id, applied_ids)
+                )
+                self.windows[key] = window
+            queue: asyncio.Queue = asyncio.Queue()
+            window.subscribers.add(queue)
+            snapshot = dict(window.last_snapshot)
+            snapshot["channel_performance"] = list(snapshot["channel_performance"].values())
+            queue.put_nowait(f"event: snapshot\ndata: {json.dumps(snapshot, default=str)}\n\n")
+            self.start()
+            return window, queue
+
+    def unsubscribe(self, window: LiveWindow, queue: asyncio.Queue):
+        # Sem await: roda entre os passos do poller, nunca no meio de um deles
+        window.subscribers.discard(queue)
+        if not window.subscribers:
+            self.windows.pop((window.store_id, window.days), None)
+
+    async def poll_once(self):
+        async with self.lock:
+            if not self.windows or self.last_order_id is None:
+                return
+            fetched = await asyncio.to_thread(
+                self._run_in_session, lambda db: self._fetch_new_orders(db, self.floor_order_id)
+            )
+            orders = [order for order in fetched if order["id"] not in self.applied_ids]
+            changed = set()
+            for window in self.windows.values():
+                if window.slide():
+                    changed.add(id(window))
+            for order in orders:
+                for window in self.windows.values():
+                    if window.apply_order(order):
+                        changed.add(id(window))
+            self.applied_ids.update(order["id"] for order in orders)
+            if fetched:
+                self.last_order_id = max(self.last_order_id, fetched[-1]["id"])
+                floor_order_id = self.floor_order_id
+                self.applied_ids = {order_id for order_id in self.applied_ids if order_id > floor_order_id}
+            for window in self.windows.values():
+                if id(window) in changed:
+                    payload = window.delta()
+                    if payload:
+                        payload["new_orders"] = len(orders)
+                        window.publish("delta", payload)
+
+    async def run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                print(f"Erro no poller ao vivo: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        """Inicia o poller no event loop atual (na primeira assinatura)"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    async def stream(self, store_id: Optional[int], days: int):
+        """Gerador SSE de um assinante: snapshot inicial, deltas e heartbeats"""
+        window, queue = await self.subscribe(store_id, days)
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=LIVE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comentário SSE mantém a conexão aberta em proxies
+                    message = ": heartbeat\n\n"
+                yield message
+        finally:
+            self.unsubscribe(window, queue)
@@ -0,0 +1,180 @@
+"""Templates SQL parametrizados executados como prepared statements do servidor.
+
+Os builders de main.py geram SQL estável por formato de requisição, com os
+valores em parâmetros nomeados (:nome). Cada texto vira um template com nome
+derivado do hash: na primeira execução numa conexão ele é preparado (PREPARE)
+e, dali em diante, roda com EXECUTE, sem novo parse e, quando o Postgres adota
+o plano genérico, sem novo planejamento.
+
+Os statements preparados de cada conexão ficam em connection.info, que dura o
+mesmo que a conexão DBAPI no pool. As estatísticas comparam o tempo de
+planejamento do EXPLAIN (SUMMARY) na primeira execução de cada template por
+conexão com o das execuções seguintes. O parse poupado não entra na conta, então
+a economia informada é um limite inferior.
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+MAX_PREPARED_PER_CONNECTION = int(os.getenv("MAX_PREPARED_PER_CONNECTION", "200"))
+MAX_QUERY_TEMPLATES = 1000
+
+# Mesmo padrão de parâmetros do sqlalchemy.text(): ignora casts (::tipo)
+BIND_PARAM = re.compile(r"(?<![:\w\\]):(\w+)(?!:)")
+
+class QueryTemplate:
+    """SQL com parâmetros nomeados convertido para PREPARE/EXECUTE"""
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.name = "q_" + hashlib.sha1(sql.encode()).hexdigest()[:16]
+        self.param_names: List[str] = []
+
+        def positional(match):
+            param = match.group(1)
+            if param not in self.param_names:
+                self.param_names.append(param)
+            return f"${self.param_names.index(param) + 1}"
+
+        self.prepare_sql = f"PREPARE {self.name} AS {BIND_PARAM.sub(positional, sql)}"
+        arguments = ", ".join(f":{param}" for param in self.param_names)
+        self.execute_sql = f"EXECUTE {self.name}({arguments})" if arguments else f"EXECUTE {self.name}"
+
+class PreparedStatements:
+    def __init__(self, max_per_connection: int = MAX_PREPARED_PER_CONNECTION):
+        self.max_per_connection = max_per_connection
+        self._templates: "OrderedDict[str, QueryTemplate]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def template(self, sql: str, label: Optional[str] = None) -> QueryTemplate:
+        """Template do SQL (cache LRU por texto, que é função do formato da requisição)"""
+        with self._lock:
+            template = self._templates.get(sql)
+            if template is None:
+                template = QueryTemplate(sql)
+                self._templates[sql] = template
+                if len(self._templates) > MAX_QUERY_TEMPLATES:
+                    _, evicted = self._templates.popitem(last=False)
+                    # Estatísticas saem junto com o template para não crescerem sem limite
+                    self._stats.pop(evicted.name, None)
+            else:
+                self._templates.move_to_end(sql)
+            stats = self._template_stats(template)
+            if label:
+                stats["label"] = label
+        return template
+
+    def _template_stats(self, template: QueryTemplate) -> Dict[str, Any]:
+        """Estatísticas do template, recriadas se ele saiu do LRU durante o uso (chamar com o lock)"""
+        return self._stats.setdefault(template.name, {
+            "label": None,
+            "executions": 0,
+            "prepares": 0,
+            "first_plans": 0,
+            "first_planning_ms": 0.0,
+            "reused_plans": 0,
+            "reused_planning_ms": 0.0,
+        })
+
+    def _prepared_on_connection(self, db: Session) -> "OrderedDict[str, bool]":
+        info = db.connection().connection.info
+        if info.pop("prepared_statements_dirty", False):
+            # Após um erro não se sabe o que ficou preparado: recomeça do zero
+            db.execute(text("DEALLOCATE ALL"))
+            info.pop("prepared_statements", None)
+        return info.setdefault("prepared_statements", OrderedDict())
+
+    def _ensure_prepared(self, db: Session, template: QueryTemplate) -> bool:
+        """Prepara o template na conexão, se preciso; retorna True se acabou de preparar"""
+        prepared = self._prepared_on_connection(db)
+        if template.name in prepared:
+            prepared.move_to_end(template.name)
+            return False
+        if len(prepared) >= self.max_per_connection:
+            oldest, _ = prepared.popitem(last=False)
+            db.execute(text(f"DEALLOCATE {oldest}"))
+        db.execute(text(template.prepare_sql))
+        prepared[template.name] = True
+        with self._lock:
+            self._template_stats(template)["prepares"] += 1
+        return True
+
+    def _arguments(self, template: QueryTemplate, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {param: params[param] for param in template.param_names}
+
+    def _mark_dirty(self, db: Session):
+        try:
+            db.connection().connection.info["prepared_statements_dirty"] = True
+        except Exception:
+            pass
+
+    def explain_cost(self, db: Session, sql: str, params: Dict[str, Any], label: Optional[str] = None) -> float:
+        """Custo estimado pelo planner para o template; registra o tempo de planejamento"""
+        template = self.template(sql, label)
+        try:
+            first = self._ensure_prepared(db, template)
+            plan = db.execute(
+                text(f"EXPLAIN (FORMAT JSON, SUMMARY) {template.execute_sql}"),
+                self._arguments(template, params),
+            ).scalar()
+        except Exception:
+            self._mark_dirty(db)
+            raise
+
+        planning_ms = float(plan[0].get("Planning Time", 0.0))
+        with self._lock:
+            stats = self._template_stats(template)
+            if first:
+                stats["first_plans"] += 1
+                stats["first_planning_ms"] += planning_ms
+            else:
+                stats["reused_plans"] += 1
+                stats["reused_planning_ms"] += planning_ms
+        return float(plan[0]["Plan"]["Total Cost"])
+
+    def execute(self, db: Session, sql: str, params: Dict[str, Any], label: Optional[str] = None):
+        template = self.template(sql, label)
+        try:
+            self._ensure_prepared(db, template)
+            result = db.execute(text(template.execute_sql), self._arguments(template, params))
+        except Exception:
+            self._mark_dirty(db)
+            raise
+        with self._lock:
+            self._template_stats(template)["executions"] += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Planejamento na primeira execução por conexão x nas reutilizações"""
+        templates = []
+        total_saved_ms = 0.0
+        with self._lock:
+            for name, stats in self._stats.items():
+                avg_first = stats["first_planning_ms"] / stats["first_plans"] if stats["first_plans"] else None
+                avg_reused = stats["reused_planning_ms"] / stats["reused_plans"] if stats["reused_plans"] else None
+                saved_ms = 0.0
+                if avg_first is not None and avg_reused is not None:
+                    saved_ms = max(avg_first - avg_reused, 0.0) * stats["reused_plans"]
+                total_saved_ms += saved_ms
+                templates.append({
+                    "template": name,
+                    "label": stats["label"],
+                    "executions": stats["executions"],
+                    "prepares": stats["prepares"],
+                    "avg_first_planning_ms": round(avg_first, 3) if avg_first is not None else None,
+                    "avg_reused_planning_ms": round(avg_reused, 3) if avg_reused is not None else None,
+                    "estimated_planning_saved_ms": round(saved_ms, 3),
+                })
+        templates.sort(key=lambda item: item["executions"], reverse=True)
+        return {
+            "templates": templates,
+            "total_templates": len(templates),
+            "estimated_planning_saved_ms": round(total_saved_ms, 3),
+        }
@@ -0,0 +1,195 @@
+"""Reenvia uma carga capturada (WORKLOAD_CAPTURE_PATH) contra uma instância local.
+
+As requisições saem nos mesmos intervalos da captura divididos pela velocidade
+(1x, 5x, 10x...), cada uma com o X-Client-Id original. Ao final, imprime por
+endpoint a distribuição de latência, a taxa de erros e a latência original
+da captura, para comparação.
+
+A latência é medida a partir do instante em que a requisição deveria sair, não
+de quando um worker a pegou: se o replayer ou o servidor ficam para trás, a
+espera entra na conta (sem coordinated omission). A espera na fila do
+replayer também é informada em separado.
+
+Uso:
+    python replay_workload.py workload.jsonl
+    python replay_workload.py workload.jsonl --speed 5 --base-url http://localhost:8000
+    python replay_workload.py workload.jsonl --speed 10 --json resultado.json
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+DEFAULT_BASE_URL = "http://localhost:8000"
+REQUEST_TIMEOUT_SECONDS = 60
+
+def load_capture(path: str) -> List[Dict[str, Any]]:
+    records = []
+    with open(path, encoding="utf-8") as log:
+        for line in log:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # Última linha pode estar incompleta se a captura foi interrompida
+                continue
+    return sorted(records, key=lambda record: record["ts"])
+
+def send(base_url: str, record: Dict[str, Any], scheduled_at: float) -> Dict[str, Any]:
+    """Envia a requisição; scheduled_at é o instante previsto (time.perf_counter)"""
+    url = base_url.rstrip("/") + record["path"]
+    if record.get("query"):
+        url += "?" + record["query"]
+    data = None
+    headers = {"X-Client-Id": str(record.get("client") or "replay")}
+    if record.get("body") is not None:
+        body = record["body"]
+        data = (json.dumps(body) if not isinstance(body, str) else body).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+
+    request = urllib.request.Request(url, data=data, headers=headers, method=record.get("method", "GET"))
+    started = time.perf_counter()
+    queue_delay_ms = max(started - scheduled_at, 0.0) * 1000
+    status: Optional[int] = None
+    error = None
+    try:
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT_SECONDS) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception as e:
+        error = type(e).__name__
+    finished = time.perf_counter()
+    return {
+        "path": record["path"],
+        "status": status,
+        "error": error,
+        "latency_ms": (finished - scheduled_at) * 1000,
+        "service_ms": (finished - started) * 1000,
+        "queue_delay_ms": queue_delay_ms,
+        "captured_latency_ms": record.get("latency_ms"),
+    }
+
+def replay(records: List[Dict[str, Any]], base_url: str, speed: float, concurrency: int) -> Dict[str, Any]:
+    """Dispara as requisições no ritmo da captura e coleta os resultados"""
+    results: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+
+    def run(record, scheduled_at):
+        result = send(base_url, record, scheduled_at)
+        with lock:
+            results.append(result)
+
+    first_ts = records[0]["ts"]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for record in records:
+            scheduled_at = started + (record["ts"] - first_ts) / speed
+            wait = scheduled_at - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            pool.submit(run, record, scheduled_at)
+    elapsed = time.perf_counter() - started
+    # Espera entre o instante previsto e o envio: se crescer, aumente --concurrency
+    max_send_delay_ms = max((r["queue_delay_ms"] for r in results), default=0.0)
+
+    return {
+        "speed": speed,
+        "requests": len(results),
+        "elapsed_seconds": round(elapsed, 2),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else None,
+        "max_send_delay_ms": round(max_send_delay_ms, 1),
+        "endpoints": summarize(results),
+    }
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Percentil por posição mais próxima"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))
+    return round(ordered[index], 1)
+
+def latency_summary(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "p50": percentile(values, 0.5),
+        "p90": percentile(values, 0.9),
+        "p99": percentile(values, 0.99),
+        "max": round(max(values), 1) if values else None,
+    }
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    groups: Dict[str, List[Dict[str, Any]]] = {"total": results}
+    for result in results:
+        groups.setdefault(result["path"], []).append(result)
+
+    summary = {}
+    for path, items in groups.items():
+        failures = [r for r in items if r["error"] or (r["status"] or 0) >= 400]
+        statuses: Dict[str, int] = {}
+        for r in items:
+            key = r["error"] or str(r["status"])
+            statuses[key] = statuses.get(key, 0) + 1
+        summary[path] = {
+            "requests": len(items),
+            "errors": len(failures),
+            "error_rate_pct": round(len(failures) / len(items) * 100, 2) if items else 0,
+            "statuses": statuses,
+            "latency_ms": latency_summary([r["latency_ms"] for r in items]),
+            "service_ms": latency_summary([r["service_ms"] for r in items]),
+            "queue_delay_ms": latency_summary([r["queue_delay_ms"] for r in items]),
+            "captured_latency_ms": latency_summary(
+                [r["captured_latency_ms"] for r in items if r["captured_latency_ms"] is not None]
+            ),
+        }
+    return summary
+
+def print_report(report: Dict[str, Any]):
+    print(
+        f"Replay {report['speed']}x: {report['requests']} requisições em {report['elapsed_seconds']}s "
+        f"({report['throughput_rps']} req/s, maior atraso de envio {report['max_send_delay_ms']} ms)"
+    )
+    header = (
+        f"{'endpoint':<22}{'reqs':>7}{'erros %':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"
+        f"{'fila p99':>10}{'p99 orig':>10}"
+    )
+    print(header)
+    print("-" * len(header))
+    for path, stats in report["endpoints"].items():
+        latency = stats["latency_ms"]
+        print(
+            f"{path:<22}{stats['requests']:>7}{stats['error_rate_pct']:>7}%"
+            f"{latency['p50'] or 0:>9}{latency['p90'] or 0:>9}{latency['p99'] or 0:>9}{latency['max'] or 0:>9}"
+            f"{stats['queue_delay_ms']['p99'] or 0:>10}{stats['captured_latency_ms']['p99'] or 0:>10}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Reenvia uma carga capturada e mede latência e erros")
+    parser.add_argument("capture", help="Arquivo JSONL gerado com WORKLOAD_CAPTURE_PATH")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="Instância alvo")
+    parser.add_argument("--speed", type=float, default=1.0, help="Multiplicador de velocidade (1, 5, 10...)")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requisições simultâneas no máximo")
+    parser.add_argument("--json", help="Grava o relatório completo neste arquivo")
+    args = parser.parse_args()
+
+    if args.speed <= 0:
+        parser.error("--speed deve ser positivo")
+    records = load_capture(args.capture)
+    if not records:
+        parser.error("captura vazia")
+
+    report = replay(records, args.base_url, args.speed, args.concurrency)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Roteamento de leituras analíticas para réplicas com controle de atraso.
+
+As rotas de leitura usam get_read_db, que distribui as sessões em round-robin
+entre as réplicas cujo atraso de replicação está abaixo de MAX_REPLICA_LAG_SECONDS.
+Sem réplica saudável, a leitura cai no primário. Escritas e manutenção de
+rollups continuam sempre no primário (get_db).
+"""
+import itertools
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.orm import sessionmaker, Session
+
+MAX_REPLICA_LAG_SECONDS = float(os.getenv("MAX_REPLICA_LAG_SECONDS", "10"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "5"))
+
+# Réplica recebendo WAL (streaming) sem nada pendente está em dia mesmo que a
+# última transação seja antiga. Com o receptor desconectado, receive = replay
+# não prova nada: vale o tempo desde a última transação aplicada (NULL, se
+# nenhuma foi aplicada, tira a réplica do rodízio)
+REPLICATION_LAG_QUERY = """
+SELECT
+    pg_is_in_recovery(),
+    CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN receiver.streaming AND pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        WHEN receiver.streaming THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END,
+    receiver.streaming
+FROM (
+    SELECT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') AS streaming
+) receiver
+"""
+
+def parse_replica_urls(value: str) -> List[str]:
+    return [url.strip() for url in value.split(",") if url.strip()]
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        # connect_timeout curto: réplica fora do ar não pode travar as leituras
+        self.engine = create_engine(url, pool_pre_ping=True, connect_args={"connect_timeout": 3})
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.lag_seconds: Optional[float] = None
+        self.in_recovery: Optional[bool] = None
+        self.wal_receiver_streaming: Optional[bool] = None
+        self.error: Optional[str] = None
+        self.checked_at = 0.0
+
+    @property
+    def name(self) -> str:
+        # Sem senha: o nome aparece no /health
+        url = make_url(self.url)
+        return f"{url.host}:{url.port or 5432}"
+
+    def refresh_lag(self):
+        try:
+            with self.engine.connect() as conn:
+                in_recovery, lag, streaming = conn.execute(text(REPLICATION_LAG_QUERY)).fetchone()
+            self.in_recovery = in_recovery
+            self.wal_receiver_streaming = streaming
+            self.lag_seconds = float(lag) if lag is not None else None
+            self.error = None
+        except Exception as e:
+            self.lag_seconds = None
+            self.error = str(e)
+        self.checked_at = time.monotonic()
+
+    def is_healthy(self, max_lag: float) -> bool:
+        return self.error is None and self.lag_seconds is not None and self.lag_seconds <= max_lag
+
+class ReplicaRouter:
+    """Escolhe primário ou réplica para cada sessão de leitura"""
+
+    def __init__(
+        self,
+        primary_engine: Engine,
+        replica_urls: List[str],
+        max_lag: float = MAX_REPLICA_LAG_SECONDS,
+        check_interval: float = REPLICA_LAG_CHECK_INTERVAL,
+    ):
+        self.primary_session_factory = sessionmaker(autocommit=False, autoflush=False, bind=primary_engine)
+        self.replicas = [Replica(url) for url in replica_urls]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._round_robin = itertools.count()
+        self._lock = threading.Lock()
+
+    def _refresh_stale_lags(self):
+        now = time.monotonic()
+        with self._lock:
+            stale = [r for r in self.replicas if now - r.checked_at >= self.check_interval]
+            # Marca antes de consultar para que outras threads não repitam a checagem
+            for replica in stale:
+                replica.checked_at = now
+        for replica in stale:
+            replica.refresh_lag()
+
+    def healthy_replicas(self) -> List[Replica]:
+        self._refresh_stale_lags()
+        return [r for r in self.replicas if r.is_healthy(self.max_lag)]
+
+    def read_session(self) -> Session:
+        healthy = self.healthy_replicas()
+        if not healthy:
+            db = self.primary_session_factory()
+            db.info["target"] = "primary"
+            return db
+        replica = healthy[next(self._round_robin) % len(healthy)]
+        db = replica.session_factory()
+        db.info["target"] = replica.name
+        return db
+
+    def status(self) -> List[Dict]:
+        self._refresh_stale_lags()
+        return [
+            {
+                "replica": r.name,
+                "lag_seconds": r.lag_seconds,
+                "in_recovery": r.in_recovery,
+                "wal_receiver_streaming": r.wal_receiver_streaming,
+                "healthy": r.is_healthy(self.max_lag),
+                "error": r.error,
+            }
+            for r in self.replicas
+        ]
@@ -0,0 +1,129 @@
+"""T-digest mesclável para percentis servidos pelos rollups.
+
+Cada digest guarda centróides (média, peso) cujo tamanho é limitado pela função
+de escala k1, que mantém centróides menores nas caudas (p99 mais preciso que o
+meio da distribuição). Digests de dias/lojas/canais diferentes são combinados
+com merge, sem reler os pedidos.
+"""
+import math
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_COMPRESSION = 100
+
+# Pontos pendentes aceitos em merge antes de comprimir (só protege a memória)
+MERGE_BUFFER_LIMIT = 100000
+
+class TDigest:
+    def __init__(self, compression: float = DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.centroids: List[Tuple[float, float]] = []
+        self.buffer: List[Tuple[float, float]] = []
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    @property
+    def count(self) -> float:
+        return sum(w for _, w in self.centroids) + sum(w for _, w in self.buffer)
+
+    def add(self, value: float, weight: float = 1):
+        value = float(value)
+        self.buffer.append((value, weight))
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self.buffer) >= self.compression * 10:
+            self.compress()
+
+    def merge(self, other: "TDigest"):
+        if other.min is None:
+            return
+        self.buffer.extend(other.centroids)
+        self.buffer.extend(other.buffer)
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        # Sem compressão a cada merge: quem mescla muitos digests paga uma única
+        # ordenação, feita ao calcular o quantil
+        if len(self.buffer) >= MERGE_BUFFER_LIMIT:
+            self.compress()
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _k_inverse(self, k: float) -> float:
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def compress(self):
+        points = sorted(self.centroids + self.buffer)
+        self.buffer = []
+        if not points:
+            self.centroids = []
+            return
+
+        total = sum(w for _, w in points)
+        merged = []
+        mean, weight = points[0]
+        cumulative = 0.0
+        limit = total * self._k_inverse(self._k(0) + 1)
+        for point_mean, point_weight in points[1:]:
+            if cumulative + weight + point_weight <= limit:
+                mean += (point_mean - mean) * point_weight / (weight + point_weight)
+                weight += point_weight
+            else:
+                merged.append((mean, weight))
+                cumulative += weight
+                limit = total * self._k_inverse(self._k(min(cumulative / total, 1.0)) + 1)
+                mean, weight = point_mean, point_weight
+        merged.append((mean, weight))
+        self.centroids = merged
+
+    def _bracket(self, q: float) -> Tuple[float, float, float]:
+        """Estimativa do quantil e os valores que a delimitam (interpolação linear)"""
+        if self.buffer:
+            self.compress()
+        if not self.centroids:
+            raise ValueError("digest vazio")
+        total = sum(w for _, w in self.centroids)
+        rank = q * total
+
+        # Centro de cada centróide fica no meio do seu peso acumulado
+        cumulative = 0.0
+        previous_center, previous_mean = 0.0, self.min
+        for mean, weight in self.centroids:
+            center = cumulative + weight / 2
+            if rank <= center:
+                span = center - previous_center
+                fraction = (rank - previous_center) / span if span > 0 else 0
+                estimate = previous_mean + (mean - previous_mean) * fraction
+                return estimate, previous_mean, mean
+            cumulative += weight
+            previous_center, previous_mean = center, mean
+
+        span = total - previous_center
+        fraction = (rank - previous_center) / span if span > 0 else 0
+        estimate = previous_mean + (self.max - previous_mean) * fraction
+        return estimate, previous_mean, self.max
+
+    def quantile(self, q: float) -> float:
+        return self._bracket(q)[0]
+
+    def error_bound(self, q: float) -> float:
+        """Maior distância entre a estimativa e os valores que a delimitam"""
+        estimate, low, high = self._bracket(q)
+        return max(estimate - low, high - estimate)
+
+    def to_dict(self) -> Dict:
+        if self.buffer:
+            self.compress()
+        return {
+            "compression": self.compression,
+            "min": self.min,
+            "max": self.max,
+            "centroids": [[round(m, 4), w] for m, w in self.centroids],
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict) -> "TDigest":
+        digest = cls(payload.get("compression", DEFAULT_COMPRESSION))
+        digest.centroids = [(float(m), float(w)) for m, w in payload["centroids"]]
+        digest.min = payload.get("min")
+        digest.max = payload.get("max")
+        return digest
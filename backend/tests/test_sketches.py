@@ -0,0 +1,28 @@
+import random
+
+from sketches import TDigest
+
+def serialized_digest(values):
+    digest = TDigest()
+    for value in values:
+        digest.add(value)
+    return digest.to_dict()
+
+def test_merge_then_quantile_uses_buffered_centroids():
+    # Mesmo caminho de merge_sketch_rows: digests diários serializados mesclados por grupo
+    random.seed(7)
+    days = [[random.uniform(10, 60) for _ in range(500)] for _ in range(3)]
+    merged = TDigest()
+    for values in days:
+        merged.merge(TDigest.from_dict(serialized_digest(values)))
+
+    assert merged.min is not None
+    assert merged.count == 1500
+    exact = sorted(v for values in days for v in values)[int(0.9 * 1500)]
+    assert abs(merged.quantile(0.9) - exact) <= merged.error_bound(0.9) + 1
+
+def test_merge_of_empty_digest_keeps_digest_empty():
+    merged = TDigest()
+    merged.merge(TDigest())
+    assert merged.min is None
+    assert merged.count == 0
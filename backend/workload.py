@@ -0,0 +1,103 @@
+"""Captura de carga real de /api/query e /api/quick-insights para replay.
+
+Ativada por WORKLOAD_CAPTURE_PATH: cada requisição capturada vira uma linha
+JSON (append-only) com o instante de chegada, cliente, método, caminho, query
+string, corpo, status e latência. A gravação roda numa thread própria, fora do
+caminho da requisição. O arquivo é lido por replay_workload.py.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable
+
+from admission import resolve_client_id
+
+WORKLOAD_CAPTURE_PATH = os.getenv("WORKLOAD_CAPTURE_PATH", "")
+
+CAPTURED_PATHS = ("/api/query", "/api/quick-insights")
+
+class CaptureWriter:
+    """Grava os registros em JSONL a partir de uma fila, numa thread daemon"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        threading.Thread(target=self._run, daemon=True, name="workload-capture").start()
+
+    def write(self, record: Dict[str, Any]):
+        self.queue.put(record)
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as log:
+            while True:
+                record = self.queue.get()
+                log.write(json.dumps(record, separators=(",", ":"), default=str) + "\n")
+                # Esvazia o que já chegou antes de forçar a escrita em disco
+                if self.queue.empty():
+                    log.flush()
+
+class WorkloadCaptureMiddleware:
+    """Middleware ASGI puro: lê o corpo enquanto a aplicação o consome, sem bufferizar a resposta"""
+
+    def __init__(self, app, log_path: str, paths: Iterable[str] = CAPTURED_PATHS):
+        self.app = app
+        self.paths = set(paths)
+        self.writer = CaptureWriter(log_path)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        arrival = time.time()
+        started = time.perf_counter()
+        body = bytearray()
+        status = 500
+
+        async def capture_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                body.extend(message.get("body", b""))
+            return message
+
+        async def capture_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            self.writer.write({
+                "ts": round(arrival, 3),
+                "client": client_id(scope),
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "body": parse_body(bytes(body)),
+                "status": status,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+            })
+
+def client_id(scope) -> str:
+    """Mesmo critério de get_client_id em main.py, para o replay respeitar os limites por cliente"""
+    header_client_id = None
+    for name, value in scope.get("headers", []):
+        if name == b"x-client-id":
+            header_client_id = value.decode("latin-1")
+    client = scope.get("client")
+    return resolve_client_id(client[0] if client else None, header_client_id)
+
+def parse_body(body: bytes):
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body.decode("utf-8", errors="replace")
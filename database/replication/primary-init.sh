@@ -0,0 +1,5 @@
+#!/bin/bash
+# Libera conexões de replicação para a réplica local (docker-compose.replica.yml)
+set -e
+
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -29,12 +29,28 @@ interface ChartVisualizationProps {
   data: Record<string, any>[]
   dimensions: string[]
   metrics: string[]
+  downsampled?: {
+    time_bucket: string
+    original_points: number
+    returned_points: number
+    dropped_series: number
+    truncated: boolean
+  }
+}
+
+// Balde usado pelo backend quando a série diária não coube no teto de linhas
+const TIME_BUCKET_LABELS: Record<string, string> = {
+  day: 'dia',
+  week: 'semana',
+  month: 'mês',
+  quarter: 'trimestre'
 }
 
 const ChartVisualization: React.FC<ChartVisualizationProps> = ({
   data,
   dimensions,
-  metrics
+  metrics,
+  downsampled
 }) => {
   const [chartType, setChartType] = React.useState<'bar' | 'line' | 'doughnut'>('bar')
 
@@ -48,6 +64,12 @@ const ChartVisualization: React.FC<ChartVisualizationProps> = ({
       avg_delivery_time: 'Tempo Médio de Entrega',
       avg_preparation_time: 'Tempo Médio de Preparo',
       avg_rating: 'Avaliação Média',
+      p50_delivery_time: 'Entrega P50',
+      p90_delivery_time: 'Entrega P90',
+      p99_delivery_time: 'Entrega P99',
+      p50_preparation_time: 'Preparo P50',
+      p90_preparation_time: 'Preparo P90',
+      p99_preparation_time: 'Preparo P99',
       unique_customers: 'Clientes Únicos',
       repeat_customers: 'Clientes Recorrentes',
       conversion_rate: 'Taxa de Conversão'
@@ -176,7 +198,18 @@ const ChartVisualization: React.FC<ChartVisualizationProps> = ({
   return (
     <div className="card">
       <div className="flex items-center justify-between mb-4">
-        <h3 className="text-lg font-semibold text-gray-900">Visualização</h3>
+        <div>
+          <h3 className="text-lg font-semibold text-gray-900">Visualização</h3>
+          {downsampled && (
+            <p className="text-xs text-gray-500">
+              {downsampled.returned_points} de {downsampled.original_points} pontos (série reduzida preservando picos e vales)
+              {dimensions[0] !== downsampled.time_bucket &&
+                `; agrupado por ${TIME_BUCKET_LABELS[downsampled.time_bucket] ?? downsampled.time_bucket}`}
+              {downsampled.dropped_series > 0 && `; ${downsampled.dropped_series} séries menores omitidas`}
+              {downsampled.truncated && '; resultado cortado no limite de linhas, restrinja o período'}
+            </p>
+          )}
+        </div>
         <div className="flex space-x-2">
           <button
             onClick={() => setChartType('bar')}
@@ -1,32 +1,62 @@
-import React, { useState } from 'react'
+import React, { useState, useEffect, useRef } from 'react'
 import { ChevronUp, ChevronDown } from 'lucide-react'
 
+// Virtualização: só as linhas visíveis (mais uma margem) vão para o DOM
+const ROW_HEIGHT = 53
+const VIEWPORT_HEIGHT = 600
+const OVERSCAN = 10
+
+export interface ServerTableState {
+  sortBy: string | null
+  sortDirection: 'asc' | 'desc'
+  page: number
+}
+
 interface DataTableProps {
   data: Record<string, any>[]
   columns: string[]
   metadata: {
     total_rows: number
     execution_time: string
+    error_bounds?: Record<string, { method: string; max_abs_error: number; unit: string }>
+  }
+  // Modo servidor: data é só a página atual; ordenação e página vão para o backend
+  server?: {
+    totalCount: number
+    pageSize: number
+    state: ServerTableState
+    loading?: boolean
+    onChange: (state: ServerTableState) => void
   }
 }
 
-const DataTable: React.FC<DataTableProps> = ({ data, columns, metadata }) => {
-  const [sortColumn, setSortColumn] = useState<string | null>(null)
-  const [sortDirection, setSortDirection] = useState<'asc' | 'desc'>('asc')
-  const [currentPage, setCurrentPage] = useState(1)
-  const itemsPerPage = 20
+const DataTable: React.FC<DataTableProps> = ({ data, columns, metadata, server }) => {
+  const [localSortColumn, setLocalSortColumn] = useState<string | null>(null)
+  const [localSortDirection, setLocalSortDirection] = useState<'asc' | 'desc'>('asc')
+  const [scrollTop, setScrollTop] = useState(0)
+  const scrollRef = useRef<HTMLDivElement>(null)
+
+  const sortColumn = server ? server.state.sortBy : localSortColumn
+  const sortDirection = server ? server.state.sortDirection : localSortDirection
+
+  // Resultado novo volta ao topo da lista
+  useEffect(() => {
+    setScrollTop(0)
+    if (scrollRef.current) scrollRef.current.scrollTop = 0
+  }, [data])
 
   const handleSort = (column: string) => {
-    if (sortColumn === column) {
-      setSortDirection(sortDirection === 'asc' ? 'desc' : 'asc')
+    const direction = sortColumn === column && sortDirection === 'asc' ? 'desc' : 'asc'
+    if (server) {
+      server.onChange({ sortBy: column, sortDirection: direction, page: 1 })
     } else {
-      setSortColumn(column)
-      setSortDirection('asc')
+      setLocalSortColumn(column)
+      setLocalSortDirection(direction)
     }
   }
 
   const sortedData = React.useMemo(() => {
-    if (!sortColumn) return data
+    if (server || !sortColumn) return data
 
     return [...data].sort((a, b) => {
       const aVal = a[sortColumn]
@@ -48,14 +78,24 @@ const DataTable: React.FC<DataTableProps> = ({ data, columns, metadata }) => {
         return bStr.localeCompare(aStr)
       }
     })
-  }, [data, sortColumn, sortDirection])
+  }, [data, server, sortColumn, sortDirection])
+
+  // Janela visível da lista local; no modo servidor a página inteira é renderizada
+  const startIndex = server ? 0 : Math.max(0, Math.floor(scrollTop / ROW_HEIGHT) - OVERSCAN)
+  const endIndex = server
+    ? sortedData.length
+    : Math.min(sortedData.length, startIndex + Math.ceil(VIEWPORT_HEIGHT / ROW_HEIGHT) + OVERSCAN * 2)
+  const visibleRows = sortedData.slice(startIndex, endIndex)
 
-  const paginatedData = React.useMemo(() => {
-    const startIndex = (currentPage - 1) * itemsPerPage
-    return sortedData.slice(startIndex, startIndex + itemsPerPage)
-  }, [sortedData, currentPage])
+  const totalRows = server ? server.totalCount : metadata.total_rows
+  const currentPage = server ? server.state.page : 1
+  const totalPages = server ? Math.max(1, Math.ceil(server.totalCount / server.pageSize)) : 1
+  const goToPage = (page: number) => server?.onChange({ ...server.state, page })
 
-  const totalPages = Math.ceil(data.length / itemsPerPage)
+  // Maior erro entre os percentis aproximados (t-digest)
+  const approximateError = Object.values(metadata.error_bounds || {})
+    .filter(bound => bound.method === 'tdigest')
+    .reduce<number | null>((max, bound) => Math.max(max ?? 0, bound.max_abs_error), null)
 
   const formatValue = (value: any, column: string) => {
     if (value === null || value === undefined) return '-'
@@ -71,7 +111,7 @@ const DataTable: React.FC<DataTableProps> = ({ data, columns, metadata }) => {
     }
     
     // Formatação para percentuais
-    if (column.includes('rate') || column.includes('percent')) {
+    if (column.includes('rate') || column.includes('percent') || column.endsWith('_change_pct')) {
       if (typeof value === 'number') {
         return `${value.toFixed(1)}%`
       }
@@ -89,7 +129,15 @@ const DataTable: React.FC<DataTableProps> = ({ data, columns, metadata }) => {
     return String(value)
   }
 
-  const getColumnLabel = (column: string) => {
+  const getColumnLabel = (column: string): string => {
+    // Colunas da comparação entre períodos (compare_to)
+    if (column.endsWith('_previous')) {
+      return `${getColumnLabel(column.slice(0, -'_previous'.length))} (anterior)`
+    }
+    if (column.endsWith('_change_pct')) {
+      return `${getColumnLabel(column.slice(0, -'_change_pct'.length))} (variação)`
+    }
+
     const labels: Record<string, string> = {
       total_revenue: 'Receita Total',
       total_orders: 'Total de Pedidos',
@@ -98,6 +146,12 @@ const DataTable: React.FC<DataTableProps> = ({ data, columns, metadata }) => {
       avg_delivery_time: 'Tempo Médio de Entrega',
       avg_preparation_time: 'Tempo Médio de Preparo',
       avg_rating: 'Avaliação Média',
+      p50_delivery_time: 'Entrega P50',
+      p90_delivery_time: 'Entrega P90',
+      p99_delivery_time: 'Entrega P99',
+      p50_preparation_time: 'Preparo P50',
+      p90_preparation_time: 'Preparo P90',
+      p99_preparation_time: 'Preparo P99',
       unique_customers: 'Clientes Únicos',
       repeat_customers: 'Clientes Recorrentes',
       conversion_rate: 'Taxa de Conversão',
@@ -123,13 +177,19 @@ const DataTable: React.FC<DataTableProps> = ({ data, columns, metadata }) => {
       <div className="flex items-center justify-between mb-4">
         <h3 className="text-lg font-semibold text-gray-900">Resultados</h3>
         <div className="text-sm text-gray-600">
-          {metadata.total_rows} registros • {metadata.execution_time}
+          {totalRows} registros • {metadata.execution_time}
+          {approximateError !== null && ` • percentis aproximados (±${approximateError.toFixed(1)} min)`}
         </div>
       </div>
 
-      <div className="overflow-x-auto">
+      <div
+        ref={scrollRef}
+        className={`overflow-auto ${server?.loading ? 'opacity-50' : ''}`}
+        style={server ? undefined : { maxHeight: VIEWPORT_HEIGHT }}
+        onScroll={server ? undefined : event => setScrollTop(event.currentTarget.scrollTop)}
+      >
         <table className="min-w-full divide-y divide-gray-200">
-          <thead className="bg-gray-50">
+          <thead className="bg-gray-50 sticky top-0">
             <tr>
               {columns.map(column => (
                 <th
@@ -152,8 +212,11 @@ const DataTable: React.FC<DataTableProps> = ({ data, columns, metadata }) => {
             </tr>
           </thead>
           <tbody className="bg-white divide-y divide-gray-200">
-            {paginatedData.map((row, index) => (
-              <tr key={index} className="hover:bg-gray-50">
+            {startIndex > 0 && (
+              <tr style={{ height: startIndex * ROW_HEIGHT }} />
+            )}
+            {visibleRows.map((row, index) => (
+              <tr key={startIndex + index} className="hover:bg-gray-50" style={{ height: ROW_HEIGHT }}>
                 {columns.map(column => (
                   <td key={column} className="px-6 py-4 whitespace-nowrap text-sm text-gray-900">
                     {formatValue(row[column], column)}
@@ -161,19 +224,22 @@ const DataTable: React.FC<DataTableProps> = ({ data, columns, metadata }) => {
                 ))}
               </tr>
             ))}
+            {endIndex < sortedData.length && (
+              <tr style={{ height: (sortedData.length - endIndex) * ROW_HEIGHT }} />
+            )}
           </tbody>
         </table>
       </div>
 
-      {/* Paginação */}
-      {totalPages > 1 && (
+      {/* Paginação no servidor */}
+      {server && totalPages > 1 && (
         <div className="flex items-center justify-between mt-4">
           <div className="text-sm text-gray-700">
-            Mostrando {((currentPage - 1) * itemsPerPage) + 1} a {Math.min(currentPage * itemsPerPage, data.length)} de {data.length} registros
+            Mostrando {((currentPage - 1) * server.pageSize) + 1} a {Math.min(currentPage * server.pageSize, server.totalCount)} de {server.totalCount} registros
           </div>
           <div className="flex space-x-2">
             <button
-              onClick={() => setCurrentPage(Math.max(1, currentPage - 1))}
+              onClick={() => goToPage(Math.max(1, currentPage - 1))}
               disabled={currentPage === 1}
               className="px-3 py-1 text-sm border border-gray-300 rounded disabled:opacity-50 disabled:cursor-not-allowed hover:bg-gray-50"
             >
@@ -183,7 +249,7 @@ const DataTable: React.FC<DataTableProps> = ({ data, columns, metadata }) => {
               Página {currentPage} de {totalPages}
             </span>
             <button
-              onClick={() => setCurrentPage(Math.min(totalPages, currentPage + 1))}
+              onClick={() => goToPage(Math.min(totalPages, currentPage + 1))}
               disabled={currentPage === totalPages}
               className="px-3 py-1 text-sm border border-gray-300 rounded disabled:opacity-50 disabled:cursor-not-allowed hover:bg-gray-50"
             >
@@ -16,6 +16,12 @@ const MetricSelector: React.FC<MetricSelectorProps> = ({ availableMetrics }) =>
     avg_delivery_time: 'Tempo Médio de Entrega',
     avg_preparation_time: 'Tempo Médio de Preparo',
     avg_rating: 'Avaliação Média',
+    p50_delivery_time: 'Entrega P50',
+    p90_delivery_time: 'Entrega P90',
+    p99_delivery_time: 'Entrega P99',
+    p50_preparation_time: 'Preparo P50',
+    p90_preparation_time: 'Preparo P90',
+    p99_preparation_time: 'Preparo P99',
     delivery_fee_total: 'Total de Taxa de Entrega',
     discount_total: 'Total de Descontos',
     tax_total: 'Total de Impostos',
@@ -1,24 +1,91 @@
-import React, { useState, useEffect } from 'react'
+import React, { useState, useEffect, useRef } from 'react'
 import { apiService, QueryRequest, QueryResponse, Metadata } from '../services/api'
+import { isAbortError } from '../services/queryCache'
 import { useQuery } from '../contexts/QueryContext'
 import MetricSelector from '../components/MetricSelector'
 import DimensionSelector from '../components/DimensionSelector'
 import FilterPanel from '../components/FilterPanel'
-import DataTable from '../components/DataTable'
+import DataTable, { ServerTableState } from '../components/DataTable'
 import ChartVisualization from '../components/ChartVisualization'
 import { Play, Download, Share2, RefreshCw } from 'lucide-react'
 
+// Espera após a última mudança de métrica/dimensão/filtro antes de consultar
+const QUERY_DEBOUNCE_MS = 400
+// Linhas trazidas para o gráfico e a tabela local; resultados maiores paginam no servidor
+const QUERY_LIMIT = 1000
+const SERVER_PAGE_SIZE = 50
+// Séries temporais longas chegam reduzidas ao que o gráfico consegue mostrar
+const CHART_MAX_POINTS = 500
+const TIME_DIMENSIONS = ['day', 'week', 'month', 'quarter']
+const INITIAL_TABLE_STATE: ServerTableState = { sortBy: null, sortDirection: 'asc', page: 1 }
+
 const Analytics: React.FC = () => {
   const { queryState } = useQuery()
   const [queryResult, setQueryResult] = useState<QueryResponse | null>(null)
   const [metadata, setMetadata] = useState<Metadata | null>(null)
   const [loading, setLoading] = useState(false)
+  const [refreshing, setRefreshing] = useState(false)
   const [error, setError] = useState<string | null>(null)
+  const abortRef = useRef<AbortController | null>(null)
+  const [tableState, setTableState] = useState<ServerTableState>(INITIAL_TABLE_STATE)
+  const [tablePage, setTablePage] = useState<QueryResponse | null>(null)
+  const [tableLoading, setTableLoading] = useState(false)
+  // Total da última página que o trouxe: uma página além do fim volta sem total
+  const [tableTotal, setTableTotal] = useState(0)
 
   useEffect(() => {
     loadMetadata()
+    return () => abortRef.current?.abort()
   }, [])
 
+  // Consulta automática (com debounce) quando o estado da consulta muda
+  useEffect(() => {
+    if (queryState.metrics.length === 0) return
+    const timer = setTimeout(() => executeQuery(), QUERY_DEBOUNCE_MS)
+    return () => clearTimeout(timer)
+  }, [queryState])
+
+  // Resultado truncado no limite ou reduzido para o gráfico: a tabela passa a
+  // ordenar e paginar no servidor, sobre as linhas completas
+  const serverTable = queryResult !== null && (
+    queryResult.metadata.total_rows >= QUERY_LIMIT || Boolean(queryResult.metadata.downsampled)
+  )
+
+  useEffect(() => {
+    setTableState(INITIAL_TABLE_STATE)
+    setTablePage(null)
+    setTableTotal(0)
+  }, [queryResult])
+
+  useEffect(() => {
+    if (!serverTable || !queryResult) return
+    const controller = new AbortController()
+    const request: QueryRequest = {
+      metrics: queryResult.query_info.metrics_requested,
+      dimensions: queryResult.query_info.dimensions_requested,
+      filters: queryResult.query_info.filters_applied,
+      date_range: queryResult.query_info.date_range,
+      limit: SERVER_PAGE_SIZE,
+      offset: (tableState.page - 1) * SERVER_PAGE_SIZE,
+      sort_by: tableState.sortBy || undefined,
+      sort_direction: tableState.sortDirection
+    }
+
+    setTableLoading(true)
+    apiService.executeQuery(request, { signal: controller.signal })
+      .then(page => {
+        setTablePage(page)
+        if (page.metadata.total_count != null) setTableTotal(page.metadata.total_count)
+      })
+      .catch(error => {
+        if (!isAbortError(error)) console.error('Erro ao carregar página:', error)
+      })
+      .finally(() => {
+        if (!controller.signal.aborted) setTableLoading(false)
+      })
+    return () => controller.abort()
+  }, [serverTable, queryResult, tableState])
+
   const loadMetadata = async () => {
     try {
       const data = await apiService.getMetadata()
@@ -29,31 +96,54 @@ const Analytics: React.FC = () => {
     }
   }
 
-  const executeQuery = async () => {
+  const executeQuery = async (force: boolean = false) => {
     if (queryState.metrics.length === 0) {
       setError('Selecione pelo menos uma métrica')
       return
     }
 
-    try {
-      setLoading(true)
+    // Uma consulta nova substitui a anterior: a resposta antiga nunca sobrescreve a nova
+    abortRef.current?.abort()
+    const controller = new AbortController()
+    abortRef.current = controller
+
+    const request: QueryRequest = {
+      metrics: queryState.metrics,
+      dimensions: queryState.dimensions,
+      filters: queryState.filters,
+      date_range: queryState.dateRange,
+      limit: QUERY_LIMIT,
+      max_points: TIME_DIMENSIONS.includes(queryState.dimensions[0]) ? CHART_MAX_POINTS : undefined
+    }
+
+    // Stale-while-revalidate: mostra o resultado em cache e só consulta se estiver vencido
+    const cached = apiService.getCachedQuery(request)
+    if (cached) {
+      setQueryResult(cached.data)
       setError(null)
-      
-      const request: QueryRequest = {
-        metrics: queryState.metrics,
-        dimensions: queryState.dimensions,
-        filters: queryState.filters,
-        date_range: queryState.dateRange,
-        limit: 1000
+      if (!cached.stale && !force) {
+        setLoading(false)
+        setRefreshing(false)
+        return
       }
+    }
 
-      const result = await apiService.executeQuery(request)
+    try {
+      setLoading(!cached)
+      setRefreshing(!!cached)
+      setError(null)
+
+      const result = await apiService.executeQuery(request, { signal: controller.signal, force })
       setQueryResult(result)
     } catch (error: any) {
+      if (isAbortError(error)) return
       console.error('Erro ao executar query:', error)
       setError(error.response?.data?.detail || 'Erro ao executar consulta')
     } finally {
-      setLoading(false)
+      if (abortRef.current === controller) {
+        setLoading(false)
+        setRefreshing(false)
+      }
     }
   }
 
@@ -87,11 +177,11 @@ const Analytics: React.FC = () => {
         
         <div className="mt-4 sm:mt-0 flex gap-2">
           <button
-            onClick={executeQuery}
-            disabled={loading || queryState.metrics.length === 0}
+            onClick={() => executeQuery(true)}
+            disabled={queryState.metrics.length === 0}
             className="btn-primary flex items-center space-x-2"
           >
-            {loading ? (
+            {loading || refreshing ? (
               <RefreshCw className="h-4 w-4 animate-spin" />
             ) : (
               <Play className="h-4 w-4" />
@@ -137,30 +227,55 @@ const Analytics: React.FC = () => {
             </div>
           )}
 
-          {loading && (
+          {loading && !queryResult && (
             <div className="flex items-center justify-center h-64 bg-white rounded-lg border border-gray-200">
               <RefreshCw className="h-8 w-8 animate-spin text-blue-600" />
               <span className="ml-2 text-gray-600">Executando consulta...</span>
             </div>
           )}
 
-          {queryResult && !loading && (
-            <div className="space-y-6">
-              {/* Visualização em gráfico */}
-              {queryState.dimensions.length > 0 && (
+          {queryResult && (
+            <div className={`space-y-6 transition-opacity ${loading ? 'opacity-50' : ''}`}>
+              {refreshing && (
+                <div className="flex items-center text-sm text-gray-500">
+                  <RefreshCw className="h-4 w-4 animate-spin mr-2" />
+                  <span>Atualizando resultado em cache...</span>
+                </div>
+              )}
+
+              {/* Visualização em gráfico (usa a consulta que gerou o resultado exibido) */}
+              {queryResult.query_info.dimensions_requested.length > 0 && (
                 <ChartVisualization 
                   data={queryResult.data}
-                  dimensions={queryState.dimensions}
-                  metrics={queryState.metrics}
+                  dimensions={queryResult.query_info.dimensions_requested}
+                  metrics={queryResult.query_info.metrics_requested}
+                  downsampled={queryResult.metadata.downsampled}
                 />
               )}
 
               {/* Tabela de dados */}
-              <DataTable 
-                data={queryResult.data}
-                columns={queryResult.metadata.columns}
-                metadata={queryResult.metadata}
-              />
+              {serverTable ? (
+                tablePage && (
+                  <DataTable
+                    data={tablePage.data}
+                    columns={tablePage.metadata.columns}
+                    metadata={tablePage.metadata}
+                    server={{
+                      totalCount: tableTotal,
+                      pageSize: SERVER_PAGE_SIZE,
+                      state: tableState,
+                      loading: tableLoading,
+                      onChange: setTableState
+                    }}
+                  />
+                )
+              ) : (
+                <DataTable 
+                  data={queryResult.data}
+                  columns={queryResult.metadata.columns}
+                  metadata={queryResult.metadata}
+                />
+              )}
             </div>
           )}
         </div>
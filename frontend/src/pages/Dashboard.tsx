@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react'
-import { apiService, QuickInsights } from '../services/api'
+import { apiService, QuickInsights, LiveInsightsUpdate } from '../services/api'
 import MetricCard from '../components/MetricCard'
 import ChartCard from '../components/ChartCard'
 import TopProductsCard from '../components/TopProductsCard'
@@ -42,6 +42,30 @@ const Dashboard: React.FC = () => {
     loadInsights()
   }, [selectedStore, selectedPeriod])
 
+  // Atualizações ao vivo: mescla apenas os campos recebidos nos insights atuais
+  useEffect(() => {
+    const applyLiveUpdate = (update: LiveInsightsUpdate) => {
+      setInsights(current => {
+        if (!current) return current
+        const removed = new Set(update.removed_channels || [])
+        const channels = new Map(
+          current.channel_performance
+            .filter(channel => !removed.has(channel.channel))
+            .map(channel => [channel.channel, channel])
+        )
+        update.channel_performance.forEach(channel => channels.set(channel.channel, channel))
+        return {
+          ...current,
+          main_metrics: { ...current.main_metrics, ...update.main_metrics },
+          channel_performance: Array.from(channels.values()).sort((a, b) => b.revenue - a.revenue)
+        }
+      })
+    }
+
+    const source = apiService.subscribeLiveInsights(selectedStore, selectedPeriod, applyLiveUpdate)
+    return () => source.close()
+  }, [selectedStore, selectedPeriod])
+
   const formatCurrency = (value: number) => {
     return new Intl.NumberFormat('pt-BR', {
       style: 'currency',
@@ -1,4 +1,5 @@
 import axios from 'axios'
+import { QueryCache, CachedResult, cacheKey } from './queryCache'
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000'
 
@@ -15,6 +16,13 @@ export interface QueryRequest {
   filters?: Record<string, any>
   date_range?: Record<string, string>
   limit?: number
+  compare_to?: 'previous_period' | 'previous_week' | 'previous_year'
+  // Ordenação e paginação no servidor (offset ativa o modo paginado)
+  sort_by?: string
+  sort_direction?: 'asc' | 'desc'
+  offset?: number
+  // Reduz séries temporais (LTTB) a no máximo este número de pontos
+  max_points?: number
 }
 
 export interface QueryResponse {
@@ -23,12 +31,29 @@ export interface QueryResponse {
     total_rows: number
     columns: string[]
     execution_time: string
+    total_count?: number | null
+    offset?: number
+    downsampled?: {
+      method: 'lttb'
+      metric: string
+      time_bucket: string
+      original_points: number
+      returned_points: number
+      dropped_series: number
+      truncated: boolean
+    }
+    error_bounds?: Record<string, {
+      method: 'exact' | 'tdigest'
+      max_abs_error: number
+      unit: string
+    }>
   }
   query_info: {
     metrics_requested: string[]
     dimensions_requested: string[]
     filters_applied: Record<string, any>
     date_range: Record<string, string>
+    compare_to?: string | null
   }
 }
 
@@ -71,11 +96,67 @@ export interface Metadata {
   }
 }
 
+export interface DeliveryHeatmapCell {
+  lat: number
+  lng: number
+  bounds: { south: number; west: number; north: number; east: number }
+  orders: number
+  revenue: number
+  avg_delivery_time: number | null
+  max_delivery_time: number | null
+  late_orders_pct: number
+}
+
+export interface DeliveryHeatmap {
+  period: { start_date: string; end_date: string }
+  cell_size_degrees: number
+  data_source: string
+  total_cells: number
+  cells: DeliveryHeatmapCell[]
+  problem_regions: DeliveryHeatmapCell[]
+}
+
+export interface DeliveryHeatmapParams {
+  storeId?: number
+  days?: number
+  startDate?: string
+  endDate?: string
+  cellFactor?: number
+  minOrders?: number
+}
+
+export interface LiveInsightsUpdate {
+  main_metrics: Partial<QuickInsights['main_metrics']>
+  channel_performance: QuickInsights['channel_performance']
+  removed_channels?: string[]
+  new_orders?: number
+}
+
+const queryCache = new QueryCache<QueryResponse>()
+
+export interface ExecuteQueryOptions {
+  // Cancela a espera; a requisição HTTP só é abortada se ninguém mais a aguarda
+  signal?: AbortSignal
+  // Ignora o cache (ex.: botão "Executar Consulta")
+  force?: boolean
+}
+
 export const apiService = {
-  // Executar query customizada
-  executeQuery: async (request: QueryRequest): Promise<QueryResponse> => {
-    const response = await api.post('/api/query', request)
-    return response.data
+  // Executar query customizada (cache + deduplicação de requisições iguais em voo)
+  executeQuery: async (request: QueryRequest, options: ExecuteQueryOptions = {}): Promise<QueryResponse> => {
+    return queryCache.fetch(
+      cacheKey(request),
+      async signal => {
+        const response = await api.post('/api/query', request, { signal })
+        return response.data
+      },
+      options
+    )
+  },
+
+  // Resultado em cache para a requisição, mesmo vencido (stale-while-revalidate)
+  getCachedQuery: (request: QueryRequest): CachedResult<QueryResponse> | null => {
+    return queryCache.peek(cacheKey(request))
   },
 
   // Buscar insights rápidos
@@ -88,6 +169,37 @@ export const apiService = {
     return response.data
   },
 
+  // Assinar atualizações ao vivo (SSE): snapshot inicial e depois só o que mudou
+  subscribeLiveInsights: (
+    storeId: number | undefined,
+    days: number,
+    onUpdate: (update: LiveInsightsUpdate) => void
+  ): EventSource => {
+    const params = new URLSearchParams()
+    if (storeId) params.append('store_id', storeId.toString())
+    params.append('days', days.toString())
+
+    const source = new EventSource(`${API_BASE_URL}/api/live/insights?${params}`)
+    const handler = (event: MessageEvent) => onUpdate(JSON.parse(event.data))
+    source.addEventListener('snapshot', handler as EventListener)
+    source.addEventListener('delta', handler as EventListener)
+    return source
+  },
+
+  // Buscar mapa de calor de entregas
+  getDeliveryHeatmap: async (options: DeliveryHeatmapParams = {}): Promise<DeliveryHeatmap> => {
+    const params = new URLSearchParams()
+    if (options.storeId) params.append('store_id', options.storeId.toString())
+    if (options.days) params.append('days', options.days.toString())
+    if (options.startDate) params.append('start_date', options.startDate)
+    if (options.endDate) params.append('end_date', options.endDate)
+    if (options.cellFactor) params.append('cell_factor', options.cellFactor.toString())
+    if (options.minOrders) params.append('min_orders', options.minOrders.toString())
+
+    const response = await api.get(`/api/delivery-heatmap?${params}`)
+    return response.data
+  },
+
   // Buscar metadados
   getMetadata: async (): Promise<Metadata> => {
     const response = await api.get('/api/metadata')
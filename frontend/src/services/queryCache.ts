@@ -0,0 +1,150 @@
+// Cache de consultas no cliente: chave pela requisição normalizada, deduplicação
+// de requisições iguais em voo e cancelamento quando ninguém mais espera a resposta.
+
+export const QUERY_CACHE_TTL_MS = 60_000
+const QUERY_CACHE_MAX_ENTRIES = 50
+
+interface CacheEntry<T> {
+  data: T
+  fetchedAt: number
+}
+
+interface InFlight<T> {
+  promise: Promise<T>
+  controller: AbortController
+  waiting: number
+}
+
+export interface CachedResult<T> {
+  data: T
+  stale: boolean
+}
+
+// Ordena chaves e listas e descarta valores vazios: filtros equivalentes geram a mesma chave
+const normalize = (value: any): any => {
+  if (Array.isArray(value)) {
+    return value.map(normalize)
+  }
+  if (value && typeof value === 'object') {
+    return Object.keys(value)
+      .sort()
+      .reduce<Record<string, any>>((acc, key) => {
+        const item = value[key]
+        if (item === undefined || item === null || item === '') return acc
+        if (Array.isArray(item) && item.length === 0) return acc
+        acc[key] = key === 'filters' ? normalizeFilters(item) : normalize(item)
+        return acc
+      }, {})
+  }
+  return value
+}
+
+// Dentro dos filtros a ordem dos valores não muda o resultado (IN / ANY)
+const normalizeFilters = (filters: Record<string, any>) => {
+  const normalized = normalize(filters)
+  Object.keys(normalized).forEach(key => {
+    if (Array.isArray(normalized[key])) {
+      normalized[key] = [...normalized[key]].sort()
+    }
+  })
+  return normalized
+}
+
+export const cacheKey = (request: object) => JSON.stringify(normalize(request))
+
+const abortError = () => new DOMException('Consulta cancelada', 'AbortError')
+
+export const isAbortError = (error: any) =>
+  error?.name === 'AbortError' || error?.name === 'CanceledError' || error?.code === 'ERR_CANCELED'
+
+export class QueryCache<T> {
+  private entries = new Map<string, CacheEntry<T>>()
+  private inFlight = new Map<string, InFlight<T>>()
+
+  constructor(private ttlMs: number = QUERY_CACHE_TTL_MS) {}
+
+  // Resultado em cache (mesmo vencido) para exibir enquanto revalida
+  peek(key: string): CachedResult<T> | null {
+    const entry = this.entries.get(key)
+    if (!entry) return null
+    return { data: entry.data, stale: Date.now() - entry.fetchedAt > this.ttlMs }
+  }
+
+  async fetch(
+    key: string,
+    fetcher: (signal: AbortSignal) => Promise<T>,
+    options: { signal?: AbortSignal; force?: boolean } = {}
+  ): Promise<T> {
+    const cached = this.peek(key)
+    if (cached && !cached.stale && !options.force) {
+      return cached.data
+    }
+
+    let flight = this.inFlight.get(key)
+    if (!flight) {
+      const controller = new AbortController()
+      const promise = fetcher(controller.signal)
+        .then(data => {
+          this.store(key, data)
+          return data
+        })
+        .finally(() => {
+          if (this.inFlight.get(key) === flight) this.inFlight.delete(key)
+        })
+      flight = { promise, controller, waiting: 0 }
+      this.inFlight.set(key, flight)
+    }
+    return this.wait(key, flight, options.signal)
+  }
+
+  private wait(key: string, flight: InFlight<T>, signal?: AbortSignal): Promise<T> {
+    if (signal?.aborted) return Promise.reject(abortError())
+    flight.waiting += 1
+
+    return new Promise<T>((resolve, reject) => {
+      let settled = false
+      const release = () => {
+        settled = true
+        flight.waiting -= 1
+        signal?.removeEventListener('abort', onAbort)
+      }
+      const onAbort = () => {
+        if (settled) return
+        release()
+        // Ninguém mais aguarda esta resposta: cancela a requisição HTTP
+        if (flight.waiting === 0) {
+          flight.controller.abort()
+          if (this.inFlight.get(key) === flight) this.inFlight.delete(key)
+        }
+        reject(abortError())
+      }
+      signal?.addEventListener('abort', onAbort)
+      flight.promise.then(
+        data => {
+          if (settled) return
+          release()
+          resolve(data)
+        },
+        error => {
+          if (settled) return
+          release()
+          reject(error)
+        }
+      )
+    })
+  }
+
+  private store(key: string, data: T) {
+    // Map preserva ordem de inserção: reinserir mantém as entradas recentes no fim
+    this.entries.delete(key)
+    this.entries.set(key, { data, fetchedAt: Date.now() })
+    while (this.entries.size > QUERY_CACHE_MAX_ENTRIES) {
+      const oldest = this.entries.keys().next().value as string
+      this.entries.delete(oldest)
+    }
+  }
+
+  clear() {
+    this.entries.clear()
+  }
+}